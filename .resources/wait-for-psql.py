@@ -4,6 +4,83 @@ import psycopg2
 import sys
 import time
 
+# Reintentos con backoff exponencial sub-segundo
+MIN_SLEEP = 0.05
+MAX_SLEEP = 0.5
+
+# Módulos con operaciones pendientes: la base todavía no es usable
+PENDING_STATES = ('to install', 'to upgrade', 'to remove')
+
+# Consultas de los caminos críticos de los módulos propios. Se ejecutan
+# sólo para cargar sus páginas en shared_buffers antes del primer request.
+WARM_QUERIES = {
+    'discount_policy_rule': """
+        SELECT client_type_id, product_id, category_id, min_quantity, discount_percentage
+          FROM discount_policy_rule
+         WHERE policy_active
+    """,
+    'stock_low_stock_alert': """
+        SELECT product_id, warehouse_id, state
+          FROM stock_low_stock_alert
+         WHERE state = 'open'
+    """,
+    'product_template': """
+        SELECT id, categ_id, low_stock_qty_available, minimal_stock, low_stock_shortage
+          FROM product_template
+         WHERE is_low_stock
+    """,
+}
+
+
+def connect(args, dbname, deadline):
+    """ Conecta con backoff hasta el deadline. Devuelve (conexión, último error). """
+    sleep, error = MIN_SLEEP, None
+    while True:
+        try:
+            conn = psycopg2.connect(user=args.db_user, host=args.db_host, port=args.db_port,
+                                    password=args.db_password, dbname=dbname, connect_timeout=2)
+            conn.autocommit = True
+            return conn, None
+        except psycopg2.OperationalError as e:
+            error = e
+        if time.time() + sleep > deadline:
+            return None, error
+        time.sleep(sleep)
+        sleep = min(sleep * 2, MAX_SLEEP)
+
+
+def modules_pending(conn, modules):
+    """ Devuelve un texto con lo que falta, o '' si los módulos están listos. """
+    with conn.cursor() as cr:
+        cr.execute("SELECT to_regclass('ir_module_module')")
+        if not cr.fetchone()[0]:
+            return 'la base no está inicializada'
+        cr.execute("SELECT name, state FROM ir_module_module WHERE state IN %s OR name IN %s",
+                   (PENDING_STATES, tuple(modules) or ('',)))
+        states = dict(cr.fetchall())
+    pending = sorted(name for name, state in states.items() if state in PENDING_STATES)
+    missing = sorted(name for name in modules if states.get(name) != 'installed')
+    if pending or missing:
+        return 'pendientes: %s, no instalados: %s' % (pending, missing)
+    return ''
+
+
+def warm(conn):
+    with conn.cursor() as cr:
+        for table, query in WARM_QUERIES.items():
+            cr.execute("SELECT to_regclass(%s)", (table,))
+            if not cr.fetchone()[0]:
+                continue
+            start = time.time()
+            try:
+                cr.execute(query)
+                rows = len(cr.fetchall())
+            except psycopg2.Error as e:
+                # Columna aún no creada (módulo sin actualizar): no es un error de arranque
+                print("Warm %s omitido: %s" % (table, e), file=sys.stderr)
+                continue
+            print("Warm %s: %s filas en %.3fs" % (table, rows, time.time() - start), file=sys.stderr)
+
 
 if __name__ == '__main__':
     arg_parser = argparse.ArgumentParser()
@@ -12,21 +89,42 @@ if __name__ == '__main__':
     arg_parser.add_argument('--db_user', required=True)
     arg_parser.add_argument('--db_password', required=True)
     arg_parser.add_argument('--timeout', type=int, default=5)
+    # Readiness: la base debe existir y los módulos estar instalados y sin operaciones pendientes
+    arg_parser.add_argument('--db_name', help="Base de datos que debe estar lista")
+    arg_parser.add_argument('--modules', default='', help="Módulos que deben estar instalados, separados por coma")
+    # Precalentar: si la base existe, cargar en memoria las tablas de los caminos críticos
+    arg_parser.add_argument('--warm_db', help="Base de datos a precalentar (se omite si no existe)")
 
     args = arg_parser.parse_args()
+    deadline = time.time() + args.timeout
 
-    start_time = time.time()
-    while (time.time() - start_time) < args.timeout:
-        try:
-            conn = psycopg2.connect(user=args.db_user, host=args.db_host, port=args.db_port, password=args.db_password, dbname='postgres')
-            error = ''
-            break
-        except psycopg2.OperationalError as e:
-            error = e
-        else:
-            conn.close()
-        time.sleep(1)
-
+    conn, error = connect(args, args.db_name or 'postgres', deadline)
     if error:
         print("Database connection failure: %s" % error, file=sys.stderr)
         sys.exit(1)
+
+    if args.db_name:
+        modules = [module.strip() for module in args.modules.split(',') if module.strip()]
+        sleep = MIN_SLEEP
+        # Se reutiliza la misma conexión mientras se espera el estado de los módulos
+        while True:
+            pending = modules_pending(conn, modules)
+            if not pending:
+                break
+            if time.time() + sleep > deadline:
+                print("Database %s not ready: %s" % (args.db_name, pending), file=sys.stderr)
+                sys.exit(1)
+            time.sleep(sleep)
+            sleep = min(sleep * 2, MAX_SLEEP)
+
+    if args.warm_db and args.warm_db.lower() != 'false':
+        if args.warm_db != (args.db_name or 'postgres'):
+            conn.close()
+            conn, error = connect(args, args.warm_db, time.time())
+        if conn:
+            warm(conn)
+        else:
+            print("Warm omitido: %s" % error, file=sys.stderr)
+
+    if conn:
+        conn.close()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Métricas por fase para odoo_backup y odoo_restore.
+
+Cada manager marca sus fases con @timed_phase; el orquestador crea un
+RunMetrics, lo asigna a sus managers y al final escribe un reporte JSON.
+El reporte anterior del mismo tipo de corrida se usa como línea base para
+marcar regresiones.
+"""
+
+import datetime
+import functools
+import glob
+import json
+import os
+import subprocess
+import threading
+import time
+
+
+def path_size(path):
+    """Tamaño en bytes de un archivo o de todo el contenido de una carpeta."""
+    if not path or not os.path.exists(path):
+        return None
+
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            total += os.lstat(os.path.join(root, name)).st_size
+
+    return total
+
+
+def container_path_size(container, path):
+    """Tamaño en bytes de un path dentro del contenedor (du -sb)."""
+    result = subprocess.run(
+        ["docker", "exec", container, "du", "-sb", path],
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        return None
+
+    return int(result.stdout.split()[0])
+
+
+def timed_phase(phase, size=None):
+    """
+    Mide la duración del método como fase del manager. size(self, result)
+    devuelve los bytes procesados. Sin métricas asignadas (self.metrics es
+    None) el método se ejecuta sin ningún costo adicional.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            metrics = getattr(self, "metrics", None)
+
+            if metrics is None:
+                return method(self, *args, **kwargs)
+
+            with metrics.phase(type(self).__name__, phase) as record:
+                result = method(self, *args, **kwargs)
+
+                if size:
+                    record["bytes"] = size(self, result)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class RunMetrics:
+    """Fases de una corrida y su reporte JSON con comparación contra la anterior."""
+
+    def __init__(self, kind, name, metrics_dir, regression_threshold=0.2, min_seconds=1.0):
+        self.kind = kind
+        self.name = name
+        self.metrics_dir = metrics_dir
+        self.regression_threshold = regression_threshold
+        # Diferencias menores a esto se ignoran (ruido en fases cortas)
+        self.min_seconds = min_seconds
+        self.started = datetime.datetime.now()
+        self.start_time = time.perf_counter()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def phase(self, manager, phase):
+        return _PhaseTimer(self, manager, phase)
+
+    def _add(self, record):
+        with self._lock:
+            self.phases.append(record)
+
+        throughput = (
+            f", {record['bytes'] / 1e6:.1f} MB, {record['throughput_mb_s']:.1f} MB/s"
+            if record.get("throughput_mb_s") is not None
+            else ""
+        )
+        print(
+            f"[métricas] {record['manager']}.{record['phase']}: {record['seconds']:.2f}s{throughput}"
+        )
+
+    def _report_prefix(self):
+        return f"{self.kind}_{self.name}_"
+
+    def _load_baseline(self):
+        reports = sorted(
+            glob.glob(os.path.join(self.metrics_dir, f"{self._report_prefix()}*.json"))
+        )
+
+        if not reports:
+            return None, None
+
+        with open(reports[-1]) as baseline_file:
+            return reports[-1], json.load(baseline_file)
+
+    def _compare(self, baseline):
+        previous = {
+            (record["manager"], record["phase"]): record for record in baseline["phases"]
+        }
+        regressions = []
+
+        for record in self.phases:
+            before = previous.get((record["manager"], record["phase"]))
+            if not before:
+                continue
+
+            delta = record["seconds"] - before["seconds"]
+            if (
+                delta > self.min_seconds
+                and record["seconds"] > before["seconds"] * (1 + self.regression_threshold)
+            ):
+                regressions.append({
+                    "manager": record["manager"],
+                    "phase": record["phase"],
+                    "seconds": record["seconds"],
+                    "baseline_seconds": before["seconds"],
+                    "throughput_mb_s": record.get("throughput_mb_s"),
+                    "baseline_throughput_mb_s": before.get("throughput_mb_s"),
+                })
+
+        return regressions
+
+    def write_report(self):
+        os.makedirs(self.metrics_dir, exist_ok=True)
+
+        baseline_path, baseline = self._load_baseline()
+        regressions = self._compare(baseline) if baseline else []
+
+        report = {
+            "kind": self.kind,
+            "name": self.name,
+            "started": self.started.isoformat(timespec="seconds"),
+            "total_seconds": time.perf_counter() - self.start_time,
+            "phases": self.phases,
+            "baseline": os.path.basename(baseline_path) if baseline_path else None,
+            "regressions": regressions,
+        }
+
+        report_path = os.path.join(
+            self.metrics_dir,
+            f"{self._report_prefix()}{self.started.strftime('%Y-%m-%d_%H%M%S')}.json",
+        )
+
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+        print(f"\n[métricas] Total: {report['total_seconds']:.2f}s. Reporte: {report_path}")
+
+        for regression in regressions:
+            print(
+                f"[métricas] ⚠ Regresión en {regression['manager']}.{regression['phase']}: "
+                f"{regression['seconds']:.2f}s (antes {regression['baseline_seconds']:.2f}s)"
+            )
+
+        return report_path
+
+
+class _PhaseTimer:
+    def __init__(self, metrics, manager, phase):
+        self.metrics = metrics
+        self.record = {"manager": manager, "phase": phase, "bytes": None}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        self.record["seconds"] = seconds
+        self.record["failed"] = exc_type is not None
+        self.record["throughput_mb_s"] = (
+            self.record["bytes"] / 1e6 / seconds
+            if self.record["bytes"] and seconds
+            else None
+        )
+        self.metrics._add(self.record)
+        return False
@@ -13,10 +13,12 @@
     'depends': ['base', 'sale', 'contacts', 'account'],
     'data': [
         'security/ir.model.access.csv',
+        'wizard/discount_policy_simulation_views.xml',
         'views/discount_policy_views.xml',
         'views/client_type_views.xml',
         'views/res_partner_views.xml',
         'data/client_type_data.xml',
+        'data/ir_cron_data.xml',
     ],
     'installable': True,
     'application': False,
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+
+from odoo import http
+from odoo.http import request
+from odoo.tools.lru import LRU
+
+# Cotizaciones ya resueltas, por base de datos y versión del conjunto de reglas.
+# Al cambiar una regla cambia la versión, así que las entradas viejas nunca se
+# vuelven a consultar y el LRU las descarta.
+_quote_cache = LRU(2048)
+
+
+class DiscountPolicyController(http.Controller):
+
+    @http.route('/discount_policy/quote', type='http', auth='user', methods=['GET', 'POST'], csrf=False)
+    def quote(self, partner_id=None, lines=None, **kwargs):
+        """
+        Devuelve los descuentos de varios productos para un cliente en una sola respuesta.
+        :param partner_id: Id de res.partner
+        :param lines: Lista JSON de pares [product_id, quantity]
+        Acepta los parámetros por query string o como cuerpo JSON. Responde con
+        ETag y 304 si el cliente ya tiene la misma cotización.
+        """
+        # JSON mal formado (ValueError) o con otra forma (TypeError) es un error del cliente
+        try:
+            if request.httprequest.mimetype == 'application/json':
+                payload = request.get_json_data()
+                if not isinstance(payload, dict):
+                    raise TypeError("El cuerpo JSON debe ser un objeto")
+                partner_id = payload.get('partner_id')
+                lines = payload.get('lines')
+            elif isinstance(lines, str):
+                lines = json.loads(lines)
+
+            if lines is not None and not isinstance(lines, list):
+                raise TypeError("lines debe ser una lista")
+            partner_id = int(partner_id)
+            lines = [(int(product_id), float(quantity)) for product_id, quantity in lines or []]
+        except (TypeError, ValueError):
+            return request.make_json_response({'error': "Parámetros inválidos: se espera partner_id y lines=[[product_id, quantity], ...]"}, status=400)
+
+        partner = request.env['res.partner'].browse(partner_id).exists()
+        if not partner:
+            return request.make_json_response({'error': "Cliente no encontrado"}, status=404)
+
+        DiscountRule = request.env['discount.policy.rule']
+        products = request.env['product.product'].browse({product_id for product_id, _qty in lines}).exists()
+        categ_by_product = {product.id: product.categ_id.parent_path for product in products}
+
+        # El resultado sólo depende de las reglas, el tipo de cliente y la
+        # rama de categorías de cada producto: eso forma la clave de caché y el ETag.
+        key = (
+            request.env.cr.dbname,
+            DiscountRule._get_rule_set_version(),
+            partner.client_type_id.id,
+            tuple((product_id, categ_by_product.get(product_id), quantity) for product_id, quantity in lines),
+        )
+        etag = hashlib.sha1(repr(key).encode()).hexdigest()
+        headers = [('ETag', '"%s"' % etag), ('Cache-Control', 'private, no-cache')]
+
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+
+        body = _quote_cache.get(key)
+        if body is None:
+            product_by_id = {product.id: product for product in products}
+            discounts = DiscountRule.get_best_discounts(
+                (partner, product_by_id.get(product_id, products.browse()), quantity)
+                for product_id, quantity in lines
+            )
+            body = json.dumps({
+                'partner_id': partner.id,
+                'version': key[1],
+                'lines': [
+                    {'product_id': product_id, 'quantity': quantity, 'discount': discount}
+                    for (product_id, quantity), discount in zip(lines, discounts)
+                ],
+            })
+            _quote_cache[key] = body
+
+        return request.make_response(body, headers=headers + [('Content-Type', 'application/json; charset=utf-8')])
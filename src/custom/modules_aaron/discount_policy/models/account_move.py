@@ -1,30 +1,58 @@
-from odoo import models, api
+from odoo import models, api, Command
+from odoo.tools import split_every
+
+# Cantidad de facturas cuyas líneas se escriben antes de cada flush
+DISCOUNT_POLICY_POST_CHUNK = 200
 
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
-    def action_post(self):
-        # Aplicar descuentos antes de postear la factura
-        for move in self:
-            if move.move_type in ('out_invoice', 'out_receipt'):
-                move._apply_discount_policy()
-        
-        return super(AccountMove, self).action_post()
+    def _post(self, soft=True):
+        # Aplicar descuentos antes de postear la factura.
+        # Se engancha en _post para cubrir también la validación masiva
+        # desde la vista lista (wizard validate.account.move).
+        self.filtered(
+            lambda move: move.move_type in ('out_invoice', 'out_receipt')
+        )._apply_discount_policy()
+
+        return super(AccountMove, self)._post(soft=soft)
 
-    def _apply_discount_policy(self):
+    def _apply_discount_policy(self, reset=False):
         """
-        Itera sobre las líneas de la factura y aplica la mejor regla de descuento encontrada.
-        Uses the centralized logic in discount.policy.rule.
+        Aplica la mejor regla de descuento a las líneas de las facturas.
+        Uses the centralized logic in discount.policy.rule: every line of the
+        recordset is resolved in one pass, then each invoice gets a single
+        grouped write and updates are flushed in chunks of invoices.
+
+        Al publicar sólo se sube el descuento (reset=False), para no pisar
+        descuentos manuales mayores. Con reset=True cada línea queda con el
+        valor vigente de la política, aunque sea menor o cero; lo usa la
+        reaplicación a documentos abiertos cuando se bajan o archivan reglas.
         """
-        self.ensure_one()
+        if not self:
+            return
+
         DiscountRule = self.env['discount.policy.rule']
-        
-        for line in self.invoice_line_ids:
-            if not line.product_id:
-                continue
-
-            best_discount = DiscountRule.get_best_discount(self.partner_id, line.product_id, line.quantity)
-            
-            # Solo aplicamos si es mejor que el actual.
-            if best_discount > line.discount:
-                line.write({'discount': best_discount})
+
+        # Prefetch de clientes, tipos de cliente, productos y categorías
+        # para todo el recordset antes de resolver.
+        lines = self.invoice_line_ids.filtered('product_id')
+        lines.mapped('move_id.partner_id.client_type_id')
+        lines.product_id.mapped('categ_id.parent_path')
+
+        discounts = DiscountRule.get_best_discounts(
+            (line.move_id.partner_id, line.product_id, line.quantity) for line in lines
+        )
+
+        # Solo aplicamos si es mejor que el actual, salvo al reiniciar.
+        commands_by_move = {}
+        for line, best_discount in zip(lines, discounts):
+            if best_discount > line.discount or (reset and best_discount != line.discount):
+                commands_by_move.setdefault(line.move_id, []).append(
+                    Command.update(line.id, {'discount': best_discount})
+                )
+
+        for moves in split_every(DISCOUNT_POLICY_POST_CHUNK, list(commands_by_move)):
+            for move in moves:
+                move.write({'invoice_line_ids': commands_by_move[move]})
+            self.env.flush_all()
@@ -1,5 +1,17 @@
+import logging
+import threading
+
 from odoo import models, fields, api
 
+_logger = logging.getLogger(__name__)
+
+# Documentos abiertos a los que se reaplican las políticas, con su dominio
+REAPPLY_TARGETS = {
+    'account.move': [('state', '=', 'draft'), ('move_type', 'in', ('out_invoice', 'out_receipt'))],
+    'sale.order': [('state', 'in', ('draft', 'sent'))],
+}
+REAPPLY_WATERMARK_PARAM = 'discount_policy.reapply_watermark.%s'
+
 class DiscountPolicy(models.Model):
     _name = 'discount.policy'
     _description = 'Discount Policy'
@@ -8,3 +20,84 @@ class DiscountPolicy(models.Model):
     active = fields.Boolean(string="Activo", default=True)
     
     rule_ids = fields.One2many('discount.policy.rule', 'policy_id', string="Reglas de Descuento")
+
+    # Cualquier cambio en la política (incluido archivar/desarchivar) invalida
+    # el índice compilado de reglas en todos los workers.
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def action_reapply_open_documents(self):
+        """
+        Programa la reaplicación de las reglas vigentes a todas las facturas y
+        cotizaciones en borrador. El trabajo lo hace el cron en segundo plano.
+        Los descuentos de esos documentos quedan en el valor vigente de la
+        política: si una regla bajó o se archivó, el descuento también baja.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        for model_name in REAPPLY_TARGETS:
+            ICP.set_param(REAPPLY_WATERMARK_PARAM % model_name, 0)
+        self.env.ref('discount_policy.ir_cron_reapply_discount_policy')._trigger()
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': "Políticas de Descuento",
+                'message': "Se reaplicarán las políticas a los documentos en borrador en segundo plano.",
+                'type': 'info',
+                'sticky': False,
+            },
+        }
+
+    @api.model
+    def _cron_reapply_discount_policy(self, chunk_size=500):
+        """
+        Reaplica las reglas a los documentos abiertos por bloques de chunk_size.
+        Cada bloque se confirma por separado y deja una marca de agua (último id
+        procesado) en ir.config_parameter, así que si el cron se interrumpe
+        continúa donde quedó. La marca se elimina al terminar cada modelo.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        for model_name, domain in REAPPLY_TARGETS.items():
+            param = REAPPLY_WATERMARK_PARAM % model_name
+            watermark = ICP.get_param(param)
+            if watermark is False:
+                continue
+
+            watermark = int(watermark)
+            Model = self.env[model_name]
+            total = Model.search_count(domain + [('id', '>', watermark)])
+            done = 0
+            while True:
+                records = Model.search(domain + [('id', '>', watermark)], order='id', limit=chunk_size)
+                if not records:
+                    break
+
+                records._apply_discount_policy(reset=True)
+                watermark = records[-1].id
+                done += len(records)
+                ICP.set_param(param, watermark)
+                _logger.info("Reaplicando políticas de descuento en %s: %s/%s", model_name, done, total)
+
+                if auto_commit:
+                    self.env.cr.commit()
+                self.env.invalidate_all()
+
+            ICP.set_param(param, False)
+            if auto_commit:
+                self.env.cr.commit()
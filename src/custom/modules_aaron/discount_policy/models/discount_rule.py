@@ -1,20 +1,31 @@
-from odoo import models, fields, api
+import hashlib
+import logging
+from bisect import bisect_right
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
 
 class DiscountPolicyRule(models.Model):
     _name = 'discount.policy.rule'
     _description = 'Reglas de Descuentos'
     _order = 'min_quantity'
 
-    policy_id = fields.Many2one('discount.policy', string="Política Padre", ondelete='cascade')
-    
+    policy_id = fields.Many2one('discount.policy', string="Política Padre", ondelete='cascade', index=True)
+    # Copia desnormalizada de policy_id.active: evita el join en la búsqueda de reglas
+    policy_active = fields.Boolean(related='policy_id.active', store=True, index=True, string="Política Activa")
+
     # Criterios de Aplicación
     client_type_id = fields.Many2one('res.client.type', string="Tipo de Cliente")
     product_id = fields.Many2one('product.product', string="Producto")
-    category_id = fields.Many2one('product.category', string="Categoría de Producto")
-    
+    category_id = fields.Many2one('product.category', string="Categoría de Producto",
+                                  help="La regla aplica a esta categoría y a todas sus subcategorías.")
+
     # Condición
     min_quantity = fields.Float(string="Cantidad Mínima", default=1.0)
-    
+
     # Beneficio
     discount_percentage = fields.Float(string="Porcentaje de Descuento (%)", required=True)
 
@@ -24,6 +35,87 @@ class DiscountPolicyRule(models.Model):
             if record.discount_percentage < 0 or record.discount_percentage > 100:
                 raise models.ValidationError("El porcentaje de descuento debe estar entre 0 y 100.")
 
+    def init(self):
+        # Índice parcial cubriente para el patrón de búsqueda de reglas:
+        # igualdad (o IS NULL) sobre los tres criterios y rango sobre la cantidad.
+        # INCLUDE permite resolver _search_best_discount con index-only scans.
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS discount_policy_rule_match_idx
+                ON discount_policy_rule (client_type_id, product_id, category_id, min_quantity)
+                INCLUDE (discount_percentage)
+                WHERE policy_active
+        """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def _register_hook(self):
+        super()._register_hook()
+        # Compila el índice al cargar el registro. Con DB_NAME definida Odoo
+        # precarga el registro antes de crear los workers, que lo heredan
+        # ya caliente: el primer request no paga la compilación.
+        # Es sólo una optimización: si falla (p. ej. una columna nueva antes
+        # de -u) se registra y la carga del registro continúa.
+        try:
+            with self.env.cr.savepoint():
+                self._get_rule_set_version()
+        except Exception:
+            _logger.warning("No se pudo precompilar el índice de reglas de descuento", exc_info=True)
+
+    @tools.ormcache()
+    def _get_rule_index(self):
+        """
+        Compila las reglas activas en un índice en memoria por registro.
+        La clave es (client_type_id, product_id, category_id), con False como
+        comodín, y el valor es una tupla (cantidades mínimas ordenadas,
+        máximo descuento acumulado hasta cada cantidad).
+        La caché se invalida en todos los workers con registry.clear_cache().
+        """
+        rows = self.sudo().search_read(
+            [('policy_active', '=', True)],
+            ['client_type_id', 'product_id', 'category_id', 'min_quantity', 'discount_percentage'],
+            load=None,
+        )
+        tiers = defaultdict(list)
+        for row in rows:
+            key = (row['client_type_id'], row['product_id'], row['category_id'])
+            tiers[key].append((row['min_quantity'], row['discount_percentage']))
+
+        index = {}
+        for key, values in tiers.items():
+            values.sort()
+            quantities = []
+            best_discounts = []
+            best = 0.0
+            for min_quantity, discount in values:
+                best = max(best, discount)
+                quantities.append(min_quantity)
+                best_discounts.append(best)
+            index[key] = (tuple(quantities), tuple(best_discounts))
+        return index
+
+    @tools.ormcache()
+    def _get_rule_set_version(self):
+        """
+        Huella del conjunto de reglas activas. Cambia cada vez que el índice
+        compilado cambia y es igual en todos los workers.
+        """
+        index = self._get_rule_index()
+        return hashlib.sha1(repr(sorted(index.items())).encode()).hexdigest()[:16]
+
     @api.model
     def get_best_discount(self, partner, product, quantity):
         """
@@ -33,27 +125,98 @@ class DiscountPolicyRule(models.Model):
         :param quantity: Cantidad float
         :return: Porcentaje de descuento (float)
         """
+        return self.get_best_discounts([(partner, product, quantity)])[0]
+
+    @api.model
+    def get_best_discounts(self, lines):
+        """
+        Versión por lotes de get_best_discount: resuelve todas las líneas de
+        un documento con una sola carga de reglas.
+        :param lines: Iterable de tuplas (partner, product, quantity)
+        :return: Lista de porcentajes de descuento, en el mismo orden
+        """
+        lines = list(lines)
+        index = self._get_rule_index()
+        if not index:
+            return [0.0] * len(lines)
+
+        discounts = []
+        for partner, product, quantity in lines:
+            if not product:
+                discounts.append(0.0)
+                continue
+            discounts.append(self._lookup_discount(
+                index,
+                {False, partner.client_type_id.id},
+                {False, product.id},
+                {False, *self._get_category_ancestor_ids(product.categ_id)},
+                quantity,
+            ))
+        return discounts
+
+    @api.model
+    def _get_category_ancestor_ids(self, category):
+        """
+        Ids de la categoría y todos sus ancestros, leídos de parent_path
+        (p. ej. "1/5/9/"), sin consultas recursivas. Una regla sobre una
+        categoría aplica a todas sus subcategorías.
+        """
+        if not category:
+            return []
+        return [int(category_id) for category_id in category.parent_path.split('/') if category_id]
+
+    @api.model
+    def _lookup_discount(self, index, client_type_ids, product_ids, category_ids, quantity):
+        best = 0.0
+        for client_type_id in client_type_ids:
+            for product_id in product_ids:
+                for category_id in category_ids:
+                    tiers = index.get((client_type_id, product_id, category_id))
+                    if not tiers:
+                        continue
+                    # Las cantidades están ordenadas: bisect da la última regla alcanzada.
+                    position = bisect_right(tiers[0], quantity)
+                    if position:
+                        best = max(best, tiers[1][position - 1])
+        return best
+
+    @api.model
+    def _search_best_discount(self, partner, product, quantity):
+        """
+        Ruta SQL de respaldo. Devuelve el mismo resultado que get_best_discount
+        sin pasar por el índice en memoria: cada combinación de criterios es
+        una consulta de igualdad sobre discount_policy_rule_match_idx.
+        """
         if not product:
             return 0.0
 
-        domain = [
-            ('policy_id.active', '=', True),
-            ('min_quantity', '<=', quantity),
-        ]
-        
-        # Condición OR para Client Type: es el del cliente O es False (para todos)
-        if partner.client_type_id:
-            domain += ['|', ('client_type_id', '=', False), ('client_type_id', '=', partner.client_type_id.id)]
-        else:
-             domain += [('client_type_id', '=', False)]
-
-        # Condición OR para Producto
-        domain += ['|', ('product_id', '=', False), ('product_id', '=', product.id)]
-        
-        # Condición OR para Categoría
-        domain += ['|', ('category_id', '=', False), ('category_id', '=', product.categ_id.id)]
-        
-        # Buscamos la regla que ofrezca el mayor descuento
-        rule = self.search(domain, order='discount_percentage desc', limit=1)
-        
-        return rule.discount_percentage if rule else 0.0
+        self.flush_model(['policy_active', 'client_type_id', 'product_id', 'category_id', 'min_quantity', 'discount_percentage'])
+
+        def criterion(column, value):
+            if value:
+                return SQL("%s = %s", SQL.identifier(column), value)
+            return SQL("%s IS NULL", SQL.identifier(column))
+
+        probes = []
+        for client_type_id in {False, partner.client_type_id.id}:
+            for product_id in {False, product.id}:
+                for category_id in {False, *self._get_category_ancestor_ids(product.categ_id)}:
+                    probes.append(SQL(
+                        """
+                        SELECT discount_percentage
+                          FROM discount_policy_rule
+                         WHERE policy_active
+                           AND %s AND %s AND %s
+                           AND min_quantity <= %s
+                        """,
+                        criterion('client_type_id', client_type_id),
+                        criterion('product_id', product_id),
+                        criterion('category_id', category_id),
+                        quantity,
+                    ))
+
+        self.env.cr.execute(SQL(
+            "SELECT MAX(discount_percentage) FROM (%s) AS probes",
+            SQL(" UNION ALL ").join(probes),
+        ))
+        return self.env.cr.fetchone()[0] or 0.0
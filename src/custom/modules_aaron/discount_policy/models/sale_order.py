@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from odoo import models, api
 
 class SaleOrder(models.Model):
@@ -6,8 +8,15 @@ class SaleOrder(models.Model):
     @api.onchange('partner_id')
     def _onchange_partner_discount_policy(self):
         # Recalcular descuentos si cambia el cliente
-        for line in self.order_line:
-            line._onchange_discount_policy()
+        self.order_line._onchange_discount_policy()
+
+    def _apply_discount_policy(self, reset=True):
+        """
+        Reaplica las reglas vigentes a todas las líneas de las órdenes. Las
+        órdenes siempre toman el valor vigente (ver el onchange), así que
+        reset se acepta sólo por simetría con account.move.
+        """
+        self.order_line._onchange_discount_policy()
 
 class SaleOrderLine(models.Model):
     _inherit = 'sale.order.line'
@@ -16,15 +25,25 @@ class SaleOrderLine(models.Model):
     def _onchange_discount_policy(self):
         """
         Aplica automáticamente el descuento al cambiar producto o cantidad.
+        Todas las líneas se resuelven en un solo lote.
         """
-        if not self.product_id or not self.order_id.partner_id:
+        lines = self.filtered(lambda line: line.product_id and line.order_id.partner_id)
+        if not lines:
             return
 
         DiscountRule = self.env['discount.policy.rule']
-        best_discount = DiscountRule.get_best_discount(self.order_id.partner_id, self.product_id, self.product_uom_qty)
-        
+        discounts = DiscountRule.get_best_discounts(
+            (line.order_id.partner_id, line.product_id, line.product_uom_qty) for line in lines
+        )
+
         # Aplicamos siempre el descuento calculado por la política.
         # Esto permite que si el nuevo cliente/cantidad no tiene descuento (0.0),
         # se elimine el descuento anterior (se "limpie").
-        if self.discount != best_discount:
-            self.discount = best_discount
+        # Agrupamos por valor para escribir una sola vez cada descuento.
+        lines_by_discount = defaultdict(lambda: self.browse())
+        for line, best_discount in zip(lines, discounts):
+            if line.discount != best_discount:
+                lines_by_discount[best_discount] |= line
+
+        for best_discount, changed_lines in lines_by_discount.items():
+            changed_lines.discount = best_discount
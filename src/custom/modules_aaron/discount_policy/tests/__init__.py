@@ -1 +1,2 @@
 from . import test_discount_policy
+from . import test_discount_policy_performance
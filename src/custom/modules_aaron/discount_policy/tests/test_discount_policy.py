@@ -1,3 +1,9 @@
+import csv
+import io
+from unittest.mock import patch
+
+import psycopg2
+
 from odoo.tests import common, Form
 from odoo.exceptions import ValidationError
 
@@ -181,3 +187,232 @@ class TestDiscountPolicy(common.TransactionCase):
         
         self.assertEqual(line.discount, 0.0, "Cliente sin tipo no tiene descuento para Prod A")
 
+    def test_09_rule_index_matches_domain_search(self):
+        """ Caso 9: El índice compilado devuelve lo mismo que la búsqueda por dominio. """
+        partners = [self.partner_retail, self.partner_wholesale, self.partner_none]
+        products = [self.product_a, self.product_b]
+        for partner in partners:
+            for product in products:
+                for qty in (0, 1, 4.99, 5, 9, 10, 10.5, 100):
+                    self.assertEqual(
+                        self.DiscountRule.get_best_discount(partner, product, qty),
+                        self.DiscountRule._search_best_discount(partner, product, qty),
+                        "El índice debe coincidir con la búsqueda por dominio (%s, %s, %s)" % (partner.name, product.name, qty),
+                    )
+
+    def test_10_rule_index_invalidation(self):
+        """ Caso 10: Crear, modificar, archivar y eliminar reglas invalida el índice. """
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, self.product_b, 1), 5.0)
+
+        rule = self.DiscountRule.create({
+            'policy_id': self.policy.id,
+            'product_id': self.product_b.id,
+            'min_quantity': 1,
+            'discount_percentage': 8.0,
+        })
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, self.product_b, 1), 8.0)
+
+        rule.discount_percentage = 12.0
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, self.product_b, 1), 12.0)
+
+        self.policy.action_archive()
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, self.product_b, 1), 0.0)
+
+        self.policy.action_unarchive()
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, self.product_b, 1), 12.0)
+
+        rule.unlink()
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, self.product_b, 1), 5.0)
+
+    def test_11_batch_discounts(self):
+        """ Caso 11: La API por lotes resuelve todas las líneas de un documento de una vez. """
+        lines = [
+            (self.partner_retail, self.product_a, 10),
+            (self.partner_wholesale, self.product_a, 5),
+            (self.partner_none, self.product_b, 1),
+            (self.partner_retail, self.Product, 10),
+        ]
+        self.assertEqual(self.DiscountRule.get_best_discounts(lines), [10.0, 20.0, 5.0, 0.0])
+
+        invoice = self.create_invoice(self.partner_wholesale, [(self.product_a, 5), (self.product_b, 2), (self.product_a, 1)])
+        invoice.action_post()
+        self.assertEqual(invoice.invoice_line_ids.mapped('discount'), [20.0, 5.0, 0.0])
+
+    def test_12_mass_posting(self):
+        """ Caso 12: Publicar varias facturas a la vez aplica los descuentos de todas. """
+        invoices = self.create_invoice(self.partner_retail, [(self.product_a, 10)])
+        invoices |= self.create_invoice(self.partner_wholesale, [(self.product_a, 5), (self.product_b, 3)])
+        invoices |= self.create_invoice(self.partner_none, [(self.product_a, 50)])
+
+        invoices._post()
+
+        self.assertEqual(invoices.mapped('state'), ['posted'] * 3)
+        self.assertEqual(invoices[0].invoice_line_ids.discount, 10.0)
+        self.assertEqual(invoices[1].invoice_line_ids.mapped('discount'), [20.0, 5.0])
+        self.assertEqual(invoices[2].invoice_line_ids.discount, 0.0)
+
+    def test_13_policy_active_denormalized(self):
+        """ Caso 13: La copia de policy_id.active en las reglas sigue al archivado de la política. """
+        rules = self.policy.rule_ids
+        self.assertTrue(all(rules.mapped('policy_active')))
+
+        self.policy.action_archive()
+        self.assertFalse(any(rules.mapped('policy_active')))
+        self.assertEqual(self.DiscountRule._search_best_discount(self.partner_wholesale, self.product_a, 5), 0.0)
+
+        self.policy.action_unarchive()
+        self.assertTrue(all(rules.mapped('policy_active')))
+        self.assertEqual(self.DiscountRule._search_best_discount(self.partner_wholesale, self.product_a, 5), 20.0)
+
+    def test_14_category_rule_applies_to_subcategories(self):
+        """ Caso 14: Una regla sobre una categoría aplica a los productos de sus subcategorías. """
+        Category = self.env['product.category']
+        parent = Category.create({'name': 'Vendibles Test'})
+        child = Category.create({'name': 'Bebidas Test', 'parent_id': parent.id})
+        leaf = Category.create({'name': 'Jugos Test', 'parent_id': child.id})
+        other = Category.create({'name': 'Otra Test'})
+
+        product_leaf = self.Product.create({'name': 'Jugo', 'categ_id': leaf.id})
+        product_other = self.Product.create({'name': 'Otro', 'categ_id': other.id})
+
+        self.DiscountRule.create({
+            'policy_id': self.policy.id,
+            'category_id': parent.id,
+            'min_quantity': 1,
+            'discount_percentage': 7.0,
+        })
+
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, product_leaf, 1), 7.0)
+        self.assertEqual(self.DiscountRule._search_best_discount(self.partner_none, product_leaf, 1), 7.0)
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_none, product_other, 1), 0.0)
+        self.assertEqual(self.DiscountRule._search_best_discount(self.partner_none, product_other, 1), 0.0)
+
+    def test_15_reapply_open_documents(self):
+        """ Caso 15: El cron reaplica las reglas vigentes a facturas y cotizaciones en borrador. """
+        invoice = self.create_invoice(self.partner_wholesale, [(self.product_a, 5)])
+        so = self.SaleOrder.create({
+            'partner_id': self.partner_wholesale.id,
+            'order_line': [(0, 0, {'product_id': self.product_a.id, 'product_uom_qty': 5, 'price_unit': 100})],
+        })
+        self.assertEqual(invoice.invoice_line_ids.discount, 0.0)
+        self.assertEqual(so.order_line.discount, 0.0)
+
+        self.policy.action_reapply_open_documents()
+        self.DiscountPolicy._cron_reapply_discount_policy(chunk_size=1)
+
+        self.assertEqual(invoice.state, 'draft')
+        self.assertEqual(invoice.invoice_line_ids.discount, 20.0)
+        self.assertEqual(so.order_line.discount, 20.0)
+        ICP = self.env['ir.config_parameter'].sudo()
+        self.assertFalse(ICP.get_param('discount_policy.reapply_watermark.account.move'))
+        self.assertFalse(ICP.get_param('discount_policy.reapply_watermark.sale.order'))
+
+    def test_16_policy_simulation(self):
+        """ Caso 16: La simulación calcula el costo de una política candidata sobre facturas publicadas. """
+        invoice = self.create_invoice(self.partner_none, [(self.product_a, 2)])
+        invoice.action_post()
+        self.assertEqual(invoice.invoice_line_ids.discount, 0.0)
+
+        candidate = self.DiscountPolicy.create({'name': 'Candidata', 'active': False})
+        self.DiscountRule.create({
+            'policy_id': candidate.id,
+            'product_id': self.product_a.id,
+            'min_quantity': 1,
+            'discount_percentage': 25.0,
+        })
+
+        simulation = self.env['discount.policy.simulation'].create({
+            'policy_id': candidate.id,
+            'date_from': invoice.invoice_date,
+            'date_to': invoice.invoice_date,
+        })
+        stream = io.StringIO()
+        simulation._write_simulation_csv(stream)
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+
+        partner_row = next(row for row in rows if row['dimension'] == 'partner' and row['id'] == str(self.partner_none.id))
+        self.assertEqual(float(partner_row['gross_amount']), 200.0)
+        self.assertEqual(float(partner_row['delta']), 50.0)
+        self.assertTrue(any(row['dimension'] == 'product' and row['id'] == str(self.product_a.id) for row in rows))
+        self.assertTrue(any(row['dimension'] == 'category' for row in rows))
+
+        # Con el filestore (storage por defecto) el adjunto guarda el contenido
+        self.env['ir.config_parameter'].sudo().set_param('ir_attachment.location', 'file')
+        action = simulation.action_export_csv()
+        self.assertEqual(action['type'], 'ir.actions.act_url')
+        attachment = self.env['ir.attachment'].search([
+            ('res_model', '=', simulation._name),
+            ('res_id', '=', simulation.id),
+        ])
+        self.assertTrue(attachment.store_fname)
+        attachment.invalidate_recordset()
+        self.assertEqual(attachment.raw.decode(), stream.getvalue())
+
+    def test_17_register_hook_warms_rule_index(self):
+        """ Caso 17: Al cargar el registro el índice de reglas queda compilado. """
+        self.env.registry.clear_cache()
+        self.DiscountRule._register_hook()
+        self.partner_wholesale.mapped('client_type_id')
+        self.product_a.mapped('categ_id.parent_path')
+        with self.assertQueryCount(0):
+            discount = self.DiscountRule.get_best_discount(self.partner_wholesale, self.product_a, 5)
+        self.assertEqual(discount, 20.0)
+
+    def test_18_reapply_lowers_outdated_discounts(self):
+        """ Caso 18: Al reaplicar, una factura en borrador baja al descuento vigente; al publicar nunca baja. """
+        invoice = self.create_invoice(self.partner_wholesale, [(self.product_a, 5), (self.product_b, 1)])
+        invoice._apply_discount_policy()
+        self.assertEqual(invoice.invoice_line_ids.mapped('discount'), [20.0, 5.0])
+
+        # Se baja la regla mayorista y se elimina la de Prod B
+        self.policy.rule_ids.filtered(lambda rule: rule.client_type_id == self.type_wholesale).discount_percentage = 15.0
+        self.policy.rule_ids.filtered(lambda rule: rule.product_id == self.product_b).unlink()
+
+        invoice._apply_discount_policy()
+        self.assertEqual(invoice.invoice_line_ids.mapped('discount'), [20.0, 5.0])
+
+        self.policy.action_reapply_open_documents()
+        self.DiscountPolicy._cron_reapply_discount_policy()
+        self.assertEqual(invoice.invoice_line_ids.mapped('discount'), [15.0, 0.0])
+
+    def test_19_register_hook_survives_index_errors(self):
+        """ Caso 19: Si el índice no se puede compilar, _register_hook no interrumpe la carga. """
+        self.env.registry.clear_cache()
+        with patch.object(type(self.DiscountRule), '_get_rule_index', side_effect=psycopg2.ProgrammingError):
+            with self.assertLogs('odoo.addons.discount_policy.models.discount_rule', level='WARNING'):
+                self.DiscountRule._register_hook()
+        # El cursor sigue usable
+        self.assertEqual(self.DiscountRule.get_best_discount(self.partner_wholesale, self.product_a, 5), 20.0)
+
+    def test_20_simulation_nets_refunds(self):
+        """ Caso 20: Las notas de crédito restan en la simulación, igual que en el ingreso neto. """
+        invoice = self.create_invoice(self.partner_none, [(self.product_a, 2)])
+        invoice.action_post()
+        refund = self.AccountMove.create({
+            'move_type': 'out_refund',
+            'partner_id': self.partner_none.id,
+            'invoice_date': invoice.invoice_date,
+            'invoice_line_ids': [(0, 0, {'product_id': self.product_a.id, 'quantity': 1, 'price_unit': 100})],
+        })
+        refund.action_post()
+
+        candidate = self.DiscountPolicy.create({'name': 'Candidata', 'active': False})
+        self.DiscountRule.create({
+            'policy_id': candidate.id,
+            'product_id': self.product_a.id,
+            'min_quantity': 1,
+            'discount_percentage': 25.0,
+        })
+        simulation = self.env['discount.policy.simulation'].create({
+            'policy_id': candidate.id,
+            'date_from': invoice.invoice_date,
+            'date_to': invoice.invoice_date,
+        })
+        stream = io.StringIO()
+        simulation._write_simulation_csv(stream)
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+
+        partner_row = next(row for row in rows if row['dimension'] == 'partner' and row['id'] == str(self.partner_none.id))
+        self.assertEqual(int(partner_row['lines']), 2)
+        self.assertEqual(float(partner_row['gross_amount']), 100.0)
+        self.assertEqual(float(partner_row['delta']), 25.0)
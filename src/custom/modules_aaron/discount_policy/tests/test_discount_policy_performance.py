@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import random
+import time
+
+from odoo.tests import common, tagged
+
+_logger = logging.getLogger(__name__)
+
+# Tamaños del set sintético; se pueden agrandar por variable de entorno.
+BENCH_RULES = int(os.environ.get('DISCOUNT_POLICY_BENCH_RULES', 300))
+BENCH_PRODUCTS = int(os.environ.get('DISCOUNT_POLICY_BENCH_PRODUCTS', 300))
+BENCH_PARTNERS_PER_TYPE = int(os.environ.get('DISCOUNT_POLICY_BENCH_PARTNERS', 5))
+BENCH_INVOICE_LINES = int(os.environ.get('DISCOUNT_POLICY_BENCH_LINES', 500))
+# Si está definida, los resultados se escriben como JSON en esta ruta
+BENCH_OUTPUT = os.environ.get('DISCOUNT_POLICY_BENCH_OUTPUT')
+# Techo de consultas por factura al publicar; no depende de la cantidad de líneas
+POSTING_QUERIES_PER_INVOICE = 60
+
+
+@tagged('post_install', '-at_install', 'discount_policy_benchmark')
+class TestDiscountPolicyPerformance(common.TransactionCase):
+    """
+    Benchmark de los caminos críticos de discount_policy. Los techos de
+    consultas hacen fallar el build si se vuelve a buscar reglas por línea.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = {
+            'sizes': {
+                'rules': BENCH_RULES,
+                'products': BENCH_PRODUCTS,
+                'partners_per_type': BENCH_PARTNERS_PER_TYPE,
+                'invoice_lines': BENCH_INVOICE_LINES,
+            },
+        }
+        cls.DiscountRule = cls.env['discount.policy.rule']
+        cls._generate_data()
+
+    @classmethod
+    def tearDownClass(cls):
+        report = json.dumps(cls.results, indent=2, sort_keys=True)
+        if BENCH_OUTPUT:
+            with open(BENCH_OUTPUT, 'w') as output:
+                output.write(report)
+        _logger.info("discount_policy benchmark:\n%s", report)
+        super().tearDownClass()
+
+    @classmethod
+    def _generate_data(cls, depth=3, width=3):
+        """
+        Genera un árbol de categorías (width hijos por nivel, depth niveles),
+        productos repartidos entre todas las categorías, partners por tipo de
+        cliente y reglas mezclando producto, categoría y tipo de cliente.
+        """
+        rng = random.Random(42)
+        Category = cls.env['product.category']
+
+        level = Category.create({'name': 'Bench Root'})
+        cls.categories = level
+        for depth_index in range(depth):
+            level = Category.create([
+                {'name': 'Bench %s-%s' % (depth_index, i), 'parent_id': parent.id}
+                for parent in level for i in range(width)
+            ])
+            cls.categories |= level
+
+        cls.products = cls.env['product.product'].create([{
+            'name': 'Bench Product %s' % i,
+            'list_price': 10.0 + i % 50,
+            'categ_id': rng.choice(cls.categories).id,
+        } for i in range(BENCH_PRODUCTS)])
+
+        cls.client_types = cls.env['res.client.type'].create([
+            {'name': 'Bench Type %s' % i} for i in range(3)
+        ])
+        cls.partners = cls.env['res.partner'].create([{
+            'name': 'Bench Partner %s-%s' % (client_type.name, i),
+            'client_type_id': client_type.id,
+        } for client_type in cls.client_types for i in range(BENCH_PARTNERS_PER_TYPE)])
+
+        policy = cls.env['discount.policy'].create({'name': 'Bench Policy'})
+        rule_vals = []
+        for i in range(BENCH_RULES):
+            kind = i % 3
+            rule_vals.append({
+                'policy_id': policy.id,
+                'client_type_id': rng.choice([False, *cls.client_types.ids]),
+                'product_id': rng.choice(cls.products).id if kind == 0 else False,
+                'category_id': rng.choice(cls.categories).id if kind == 1 else False,
+                'min_quantity': rng.choice([1, 5, 10, 50]),
+                'discount_percentage': rng.randint(1, 30),
+            })
+        cls.DiscountRule.create(rule_vals)
+
+        cls.triples = [
+            (rng.choice(cls.partners), rng.choice(cls.products), rng.choice([1, 5, 12, 60]))
+            for _i in range(BENCH_INVOICE_LINES)
+        ]
+
+    def _prefetch(self):
+        self.partners.mapped('client_type_id')
+        self.products.mapped('categ_id.parent_path')
+
+    def _record(self, name, **values):
+        self.results[name] = values
+
+    def test_01_index_compile(self):
+        """ Compilar el índice de reglas cuesta un número fijo de consultas. """
+        self.env.registry.clear_cache()
+        start = time.perf_counter()
+        with self.assertQueryCount(2):
+            self.DiscountRule._get_rule_index()
+        self._record('index_compile', seconds=time.perf_counter() - start)
+
+    def test_02_get_best_discount_latency(self):
+        """ Con el índice caliente, get_best_discount no consulta la base de datos. """
+        self.DiscountRule._get_rule_index()
+        self._prefetch()
+
+        timings = []
+        with self.assertQueryCount(0):
+            for partner, product, quantity in self.triples:
+                start = time.perf_counter()
+                self.DiscountRule.get_best_discount(partner, product, quantity)
+                timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        self._record(
+            'get_best_discount',
+            calls=len(timings),
+            mean_us=sum(timings) / len(timings) * 1e6,
+            p50_us=timings[len(timings) // 2] * 1e6,
+            p95_us=timings[int(len(timings) * 0.95)] * 1e6,
+        )
+
+    def test_03_batch_matches_single_lookups(self):
+        """ La API por lotes coincide con la búsqueda SQL de respaldo. """
+        sample = self.triples[:50]
+        self.assertEqual(
+            self.DiscountRule.get_best_discounts(sample),
+            [self.DiscountRule._search_best_discount(*triple) for triple in sample],
+        )
+
+    def _create_invoice(self, partner, triples):
+        return self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': partner.id,
+            'invoice_line_ids': [(0, 0, {
+                'product_id': product.id,
+                'quantity': quantity,
+                'price_unit': product.list_price,
+            }) for _partner, product, quantity in triples],
+        })
+
+    def test_04_invoice_discount_resolution_is_constant(self):
+        """ Aplicar los descuentos de una factura no depende de su número de líneas. """
+        partner = self.partners[0]
+        small = self._create_invoice(partner, self.triples[:10])
+        large = self._create_invoice(partner, self.triples)
+        self.DiscountRule._get_rule_index()
+
+        counts = {}
+        for name, invoice in (('small', small), ('large', large)):
+            self.env.invalidate_all()
+            queries_before = self.cr.sql_log_count
+            with self.assertQueryCount(40):
+                invoice._apply_discount_policy()
+            counts[name] = self.cr.sql_log_count - queries_before
+        self._record('invoice_discount_queries', lines_small=len(small.invoice_line_ids),
+                     lines_large=len(large.invoice_line_ids), **counts)
+
+    def test_05_invoice_posting_throughput(self):
+        """ Throughput de publicación de facturas con aplicación de descuentos. """
+        invoices = self.env['account.move']
+        chunk = max(1, BENCH_INVOICE_LINES // 10)
+        for i in range(10):
+            triples = self.triples[i * chunk:(i + 1) * chunk]
+            invoices |= self._create_invoice(triples[0][0], triples)
+
+        start = time.perf_counter()
+        queries_before = self.cr.sql_log_count
+        with self.assertQueryCount(POSTING_QUERIES_PER_INVOICE * len(invoices)):
+            invoices.action_post()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(set(invoices.mapped('state')), {'posted'})
+        self._record(
+            'invoice_posting',
+            invoices=len(invoices),
+            lines=len(invoices.invoice_line_ids),
+            seconds=elapsed,
+            lines_per_second=len(invoices.invoice_line_ids) / elapsed,
+            queries=self.cr.sql_log_count - queries_before,
+        )
+
+    def _create_order(self, partner, triples):
+        return self.env['sale.order'].create({
+            'partner_id': partner.id,
+            'order_line': [(0, 0, {
+                'product_id': product.id,
+                'product_uom_qty': quantity,
+            }) for _partner, product, quantity in triples],
+        })
+
+    def test_06_sale_line_onchange_cost(self):
+        """ El onchange de descuentos de una orden completa es un solo lote. """
+        partner = self.partners[-1]
+        small = self._create_order(partner, self.triples[:10])
+        large = self._create_order(partner, self.triples)
+        self.DiscountRule._get_rule_index()
+
+        timings = {}
+        for name, order in (('small', small), ('large', large)):
+            self.env.invalidate_all()
+            start = time.perf_counter()
+            with self.assertQueryCount(12, flush=False):
+                order._onchange_partner_discount_policy()
+            timings[name] = time.perf_counter() - start
+
+        self._record('sale_line_onchange', lines=len(large.order_line),
+                     seconds=timings['large'], seconds_small=timings['small'])
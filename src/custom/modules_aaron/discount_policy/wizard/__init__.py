@@ -0,0 +1 @@
+from . import discount_policy_simulation
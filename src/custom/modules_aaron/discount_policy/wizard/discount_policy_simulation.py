@@ -0,0 +1,190 @@
+import csv
+import io
+import tempfile
+from datetime import timedelta
+
+from odoo import models, fields
+from odoo.tools import SQL
+
+# Filas agregadas que se leen del cursor en cada vuelta
+SIMULATION_FETCH_SIZE = 2000
+
+class DiscountPolicySimulation(models.TransientModel):
+    _name = 'discount.policy.simulation'
+    _description = 'Simulación de Política de Descuento'
+
+    policy_id = fields.Many2one('discount.policy', string="Política a Simular", required=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string="Compañía", required=True, default=lambda self: self.env.company)
+    date_from = fields.Date(string="Desde", required=True, default=lambda self: fields.Date.context_today(self) - timedelta(days=365))
+    date_to = fields.Date(string="Hasta", required=True, default=fields.Date.context_today)
+
+    def _get_simulation_query(self):
+        """
+        Evalúa la política candidata sobre las líneas de facturas publicadas
+        íntegramente en SQL y devuelve los deltas agregados por cliente,
+        producto y categoría en un solo recorrido (GROUPING SETS).
+        El descuento simulado de cada línea es el mayor entre el que ya tiene
+        y el de la política candidata, igual que al publicar una factura.
+        Las notas de crédito restan (signo opuesto), así los totales cuadran
+        con el ingreso neto publicado.
+        Los importes están en la moneda de la compañía: la tasa de cada
+        factura sale de una de sus líneas con importe en moneda no nulo o, si
+        no hay ninguna, de las tasas de res.currency.rate a la fecha.
+        """
+        self.ensure_one()
+        return SQL(
+            """
+            WITH moves AS (
+                SELECT am.id,
+                       am.partner_id,
+                       CASE WHEN am.move_type = 'out_refund' THEN -1 ELSE 1 END AS sign,
+                       CASE WHEN am.currency_id = company.currency_id THEN 1
+                            ELSE COALESCE(move_rate.rate, table_rate.rate) END AS rate
+                  FROM account_move am
+                  JOIN res_company company ON company.id = am.company_id
+             LEFT JOIN LATERAL (
+                       SELECT ABS(rate_line.balance / rate_line.amount_currency) AS rate
+                         FROM account_move_line rate_line
+                        WHERE rate_line.move_id = am.id
+                          AND rate_line.amount_currency != 0
+                        LIMIT 1
+                       ) move_rate ON am.currency_id != company.currency_id
+             LEFT JOIN LATERAL (
+                       SELECT COALESCE((SELECT currency_rate.rate
+                                          FROM res_currency_rate currency_rate
+                                         WHERE currency_rate.currency_id = company.currency_id
+                                           AND (currency_rate.company_id = am.company_id OR currency_rate.company_id IS NULL)
+                                           AND currency_rate.name <= am.invoice_date
+                                      ORDER BY currency_rate.name DESC, currency_rate.company_id NULLS LAST
+                                         LIMIT 1), 1)
+                            / COALESCE((SELECT currency_rate.rate
+                                          FROM res_currency_rate currency_rate
+                                         WHERE currency_rate.currency_id = am.currency_id
+                                           AND (currency_rate.company_id = am.company_id OR currency_rate.company_id IS NULL)
+                                           AND currency_rate.name <= am.invoice_date
+                                      ORDER BY currency_rate.name DESC, currency_rate.company_id NULLS LAST
+                                         LIMIT 1), 1) AS rate
+                       ) table_rate ON am.currency_id != company.currency_id AND move_rate.rate IS NULL
+                 WHERE am.state = 'posted'
+                   AND am.move_type IN ('out_invoice', 'out_receipt', 'out_refund')
+                   AND am.company_id = %(company_id)s
+                   AND am.invoice_date BETWEEN %(date_from)s AND %(date_to)s
+            ),
+            simulated AS (
+                SELECT am.partner_id,
+                       aml.product_id,
+                       pt.categ_id,
+                       aml.discount AS old_discount,
+                       GREATEST(aml.discount, COALESCE(candidate.discount, 0)) AS new_discount,
+                       am.sign * aml.price_unit * aml.quantity * am.rate AS gross
+                  FROM account_move_line aml
+                  JOIN moves am ON am.id = aml.move_id
+                  JOIN res_partner rp ON rp.id = am.partner_id
+                  JOIN product_product pp ON pp.id = aml.product_id
+                  JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                  JOIN product_category pc ON pc.id = pt.categ_id
+             LEFT JOIN LATERAL (
+                       SELECT MAX(rule.discount_percentage) AS discount
+                         FROM discount_policy_rule rule
+                        WHERE rule.policy_id = %(policy_id)s
+                          AND rule.min_quantity <= aml.quantity
+                          AND (rule.client_type_id IS NULL OR rule.client_type_id = rp.client_type_id)
+                          AND (rule.product_id IS NULL OR rule.product_id = aml.product_id)
+                          AND (rule.category_id IS NULL
+                               OR rule.category_id = ANY(string_to_array(rtrim(pc.parent_path, '/'), '/')::int[]))
+                       ) candidate ON TRUE
+                 WHERE aml.display_type = 'product'
+            )
+            SELECT CASE WHEN GROUPING(partner_id) = 0 THEN 'partner'
+                        WHEN GROUPING(product_id) = 0 THEN 'product'
+                        ELSE 'category' END AS dimension,
+                   COALESCE(partner_id, product_id, categ_id) AS res_id,
+                   COUNT(*) AS line_count,
+                   SUM(gross) AS gross_amount,
+                   SUM(gross * old_discount / 100) AS current_discount,
+                   SUM(gross * new_discount / 100) AS simulated_discount,
+                   SUM(gross * (new_discount - old_discount) / 100) AS delta
+              FROM simulated
+          GROUP BY GROUPING SETS ((partner_id), (product_id), (categ_id))
+          ORDER BY dimension, delta DESC
+            """,
+            policy_id=self.policy_id.id,
+            company_id=self.company_id.id,
+            date_from=self.date_from,
+            date_to=self.date_to,
+        )
+
+    def _write_simulation_csv(self, stream):
+        """ Escribe el resultado de la simulación en stream, por bloques del cursor. """
+        self.ensure_one()
+        models_by_dimension = {
+            'partner': self.env['res.partner'],
+            'product': self.env['product.product'],
+            'category': self.env['product.category'],
+        }
+        currency = self.company_id.currency_id
+
+        writer = csv.writer(stream)
+        writer.writerow(['dimension', 'id', 'name', 'lines', 'gross_amount', 'current_discount', 'simulated_discount', 'delta'])
+
+        self.env['account.move.line'].flush_model()
+        self.env['account.move'].flush_model()
+        # Cursor del lado del servidor (DECLARE) en la misma transacción: cada
+        # FETCH trae sólo un bloque, el resultado nunca está completo en memoria.
+        cr = self.env.cr
+        cr.execute(SQL(
+            "DECLARE discount_policy_simulation NO SCROLL CURSOR FOR %s",
+            self._get_simulation_query(),
+        ))
+        while True:
+            cr.execute(SQL("FETCH FORWARD %s FROM discount_policy_simulation", SIMULATION_FETCH_SIZE))
+            rows = cr.fetchall()
+            if not rows:
+                break
+            self._write_simulation_rows(writer, rows, models_by_dimension, currency)
+        cr.execute(SQL("CLOSE discount_policy_simulation"))
+
+    def _write_simulation_rows(self, writer, rows, models_by_dimension, currency):
+        """ Escribe un bloque de filas agregadas. Los nombres se leen en un solo read por dimensión. """
+        names = {}
+        for dimension, Model in models_by_dimension.items():
+            ids = [row[1] for row in rows if row[0] == dimension and row[1]]
+            names.update({(dimension, record.id): record.display_name for record in Model.browse(ids)})
+
+        for dimension, res_id, line_count, gross, current, simulated, delta in rows:
+            writer.writerow([
+                dimension,
+                res_id or '',
+                names.get((dimension, res_id), ''),
+                line_count,
+                currency.round(gross or 0.0),
+                currency.round(current or 0.0),
+                currency.round(simulated or 0.0),
+                currency.round(delta or 0.0),
+            ])
+
+    def action_export_csv(self):
+        self.ensure_one()
+        # El CSV se escribe por bloques en un archivo temporal, sin copias
+        # intermedias en memoria; ir.attachment lo guarda según su storage.
+        with tempfile.TemporaryFile() as output:
+            stream = io.TextIOWrapper(output, encoding='utf-8', newline='')
+            self._write_simulation_csv(stream)
+            stream.flush()
+            stream.detach()
+            output.seek(0)
+            raw = output.read()
+
+        attachment = self.env['ir.attachment'].create({
+            'name': "simulacion_%s_%s_%s.csv" % (self.policy_id.name, self.date_from, self.date_to),
+            'type': 'binary',
+            'raw': raw,
+            'mimetype': 'text/csv',
+            'res_model': self._name,
+            'res_id': self.id,
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % attachment.id,
+            'target': 'self',
+        }
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+{
+    'name': "Hot Path Profiler",
+
+    'summary': "Métricas de latencia y consultas SQL de los caminos críticos de los módulos propios",
+
+    'description': """
+Instrumenta get_best_discount, la aplicación de descuentos en facturas y
+órdenes de venta y la validación de movimientos de stock. Se activa por base
+de datos con el parámetro de sistema hotpath_profiler.enabled.
+    """,
+
+    'author': "Aarón",
+    'website': "",
+
+    'category': 'Technical',
+    'version': '17.0.0.1',
+
+    'depends': ['base', 'discount_policy', 'inventory_alerts'],
+
+    'data': [
+        'security/ir.model.access.csv',
+        'data/ir_config_parameter_data.xml',
+        'views/hotpath_profile_stat_views.xml',
+    ],
+    'installable': True,
+    'application': False,
+    'license': 'LGPL-3',
+}
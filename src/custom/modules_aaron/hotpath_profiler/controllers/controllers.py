@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.exceptions import AccessError
+from odoo.http import request
+
+
+class HotpathProfilerController(http.Controller):
+
+    @http.route('/hotpath_profiler/stats', type='json', auth='user')
+    def stats(self):
+        """
+        Estadísticas de los caminos críticos para monitoreo externo.
+        Incluye lo acumulado por el worker que atiende el request.
+        """
+        if not request.env.user.has_group('base.group_system'):
+            raise AccessError("Sólo los administradores pueden consultar las estadísticas.")
+        return {
+            'enabled': request.env['hotpath.profile.stat']._is_enabled(),
+            'stats': request.env['hotpath.profile.stat'].get_stats(),
+        }
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import hotpath_profile_stat
+from . import instrumented_models
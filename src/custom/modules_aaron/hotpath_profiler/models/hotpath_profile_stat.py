@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+ENABLED_PARAM = 'hotpath_profiler.enabled'
+# Cada worker acumula en memoria y vuelca a la base cada FLUSH_INTERVAL segundos
+FLUSH_INTERVAL = 60
+# Límites superiores (ms) de los buckets del histograma; el último bucket es abierto.
+# Al ser fijos, los histogramas de distintos workers se suman sin perder percentiles.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# {dbname: {entry_point: [llamadas, consultas, ms totales, histograma]}}
+_buffers = {}
+_next_flush = {}
+_lock = threading.Lock()
+
+
+def profiled(entry_point):
+    """
+    Mide llamadas, consultas SQL y latencia del método decorado. Con el
+    perfilado desactivado el costo es una consulta a la caché del registro.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            Stat = self.env['hotpath.profile.stat']
+            if not Stat._is_enabled():
+                return method(self, *args, **kwargs)
+
+            cr = self.env.cr
+            queries = cr.sql_log_count
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                Stat._record(entry_point, (time.perf_counter() - start) * 1000, cr.sql_log_count - queries)
+        return wrapper
+    return decorator
+
+
+def _histogram_percentile(histogram, percentile):
+    """ Límite superior del bucket que contiene el percentil (aproximado por exceso). """
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    threshold = total * percentile / 100.0
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= threshold:
+            return float(LATENCY_BUCKETS[min(index, len(LATENCY_BUCKETS) - 1)])
+    return float(LATENCY_BUCKETS[-1])
+
+
+class HotpathProfileStat(models.Model):
+    _name = 'hotpath.profile.stat'
+    _description = 'Estadísticas de Caminos Críticos'
+    _order = 'total_ms desc'
+    _rec_name = 'entry_point'
+
+    entry_point = fields.Char(string="Punto de Entrada", required=True, readonly=True)
+    call_count = fields.Integer(string="Llamadas", readonly=True)
+    query_count = fields.Integer(string="Consultas SQL", readonly=True)
+    total_ms = fields.Float(string="Tiempo Total (ms)", readonly=True)
+    # Conteos por bucket de LATENCY_BUCKETS separados por comas
+    histogram = fields.Char(string="Histograma", readonly=True)
+
+    avg_ms = fields.Float(string="Promedio (ms)", compute='_compute_latency')
+    queries_per_call = fields.Float(string="Consultas por Llamada", compute='_compute_latency')
+    p50_ms = fields.Float(string="p50 (ms)", compute='_compute_latency')
+    p95_ms = fields.Float(string="p95 (ms)", compute='_compute_latency')
+    p99_ms = fields.Float(string="p99 (ms)", compute='_compute_latency')
+
+    _sql_constraints = [
+        ('entry_point_uniq', 'unique(entry_point)', "Sólo puede haber una estadística por punto de entrada."),
+    ]
+
+    @api.depends('call_count', 'query_count', 'total_ms', 'histogram')
+    def _compute_latency(self):
+        for stat in self:
+            calls = stat.call_count or 0
+            histogram = [int(count) for count in (stat.histogram or '').split(',') if count]
+            stat.avg_ms = stat.total_ms / calls if calls else 0.0
+            stat.queries_per_call = stat.query_count / calls if calls else 0.0
+            stat.p50_ms = _histogram_percentile(histogram, 50)
+            stat.p95_ms = _histogram_percentile(histogram, 95)
+            stat.p99_ms = _histogram_percentile(histogram, 99)
+
+    @api.model
+    @tools.ormcache()
+    def _is_enabled(self):
+        """ Se invalida con registry.clear_cache() al modificar cualquier parámetro. """
+        return tools.str2bool(self.env['ir.config_parameter'].sudo().get_param(ENABLED_PARAM, 'False'))
+
+    @api.model
+    def _record(self, entry_point, elapsed_ms, queries):
+        dbname = self.env.cr.dbname
+        now = time.monotonic()
+        with _lock:
+            stats = _buffers.setdefault(dbname, {}).setdefault(
+                entry_point, [0, 0, 0.0, [0] * (len(LATENCY_BUCKETS) + 1)])
+            stats[0] += 1
+            stats[1] += queries
+            stats[2] += elapsed_ms
+            stats[3][bisect_left(LATENCY_BUCKETS, elapsed_ms)] += 1
+
+            due = _next_flush.setdefault(dbname, now + FLUSH_INTERVAL) <= now
+            if due:
+                _next_flush[dbname] = now + FLUSH_INTERVAL
+        if due:
+            self._flush_buffer()
+
+    @api.model
+    def _flush_buffer(self, cr=None):
+        """
+        Suma lo acumulado por este proceso a las filas de la base. Por
+        defecto usa un cursor propio, para no depender del resultado de la
+        transacción del request. Si falla, lo acumulado vuelve al buffer.
+        """
+        dbname = self.env.cr.dbname
+        with _lock:
+            buffer = _buffers.pop(dbname, None)
+        if not buffer:
+            return
+
+        try:
+            if cr is not None:
+                self._merge_stats(cr, buffer)
+            else:
+                with self.env.registry.cursor() as flush_cr:
+                    self._merge_stats(flush_cr, buffer)
+        except Exception:
+            _logger.warning("No se pudieron guardar las estadísticas de caminos críticos", exc_info=True)
+            with _lock:
+                current = _buffers.setdefault(dbname, {})
+                for entry_point, (calls, queries, total_ms, histogram) in buffer.items():
+                    stats = current.setdefault(entry_point, [0, 0, 0.0, [0] * len(histogram)])
+                    stats[0] += calls
+                    stats[1] += queries
+                    stats[2] += total_ms
+                    stats[3] = [a + b for a, b in zip(stats[3], histogram)]
+
+    @api.model
+    def _merge_stats(self, cr, buffer):
+        # Suma atómica en SQL: varios workers pueden volcar a la vez
+        for entry_point, (calls, queries, total_ms, histogram) in buffer.items():
+            cr.execute("""
+                INSERT INTO hotpath_profile_stat
+                    (entry_point, call_count, query_count, total_ms, histogram,
+                     create_uid, write_uid, create_date, write_date)
+                VALUES (%(entry_point)s, %(calls)s, %(queries)s, %(total_ms)s, %(histogram)s,
+                        %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC')
+                ON CONFLICT (entry_point) DO UPDATE SET
+                    call_count = hotpath_profile_stat.call_count + EXCLUDED.call_count,
+                    query_count = hotpath_profile_stat.query_count + EXCLUDED.query_count,
+                    total_ms = hotpath_profile_stat.total_ms + EXCLUDED.total_ms,
+                    histogram = (
+                        SELECT string_agg((COALESCE(a::int, 0) + COALESCE(b::int, 0))::text, ',' ORDER BY n)
+                          FROM unnest(string_to_array(hotpath_profile_stat.histogram, ','),
+                                      string_to_array(EXCLUDED.histogram, ','))
+                               WITH ORDINALITY AS t(a, b, n)
+                    ),
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+            """, {
+                'entry_point': entry_point,
+                'calls': calls,
+                'queries': queries,
+                'total_ms': total_ms,
+                'histogram': ','.join(map(str, histogram)),
+                'uid': self.env.uid,
+            })
+        # Con el cursor propio de volcado el env del request nunca leyó estas
+        # filas: no se toca su caché. Sólo al volcar en el mismo cursor
+        # (get_stats, tests) se refrescan las estadísticas ya leídas.
+        if cr is self.env.cr:
+            self.invalidate_model()
+
+    def action_reset_stats(self):
+        """ Borra todas las estadísticas y lo acumulado por este proceso. """
+        with _lock:
+            _buffers.pop(self.env.cr.dbname, None)
+        self.sudo().search([]).unlink()
+
+    @api.model
+    def get_stats(self):
+        """ Estadísticas actuales, incluyendo lo acumulado por este proceso. """
+        self._flush_buffer(self.env.cr)
+        return [{
+            'entry_point': stat.entry_point,
+            'calls': stat.call_count,
+            'queries_per_call': stat.queries_per_call,
+            'total_ms': stat.total_ms,
+            'avg_ms': stat.avg_ms,
+            'p50_ms': stat.p50_ms,
+            'p95_ms': stat.p95_ms,
+            'p99_ms': stat.p99_ms,
+        } for stat in self.search([])]
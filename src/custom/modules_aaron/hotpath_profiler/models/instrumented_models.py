@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from odoo import api, models
+
+from .hotpath_profile_stat import profiled
+
+
+class DiscountPolicyRule(models.Model):
+    _inherit = 'discount.policy.rule'
+
+    @api.model
+    @profiled('discount.policy.rule.get_best_discount')
+    def get_best_discount(self, partner, product, quantity):
+        return super().get_best_discount(partner, product, quantity)
+
+    @api.model
+    @profiled('discount.policy.rule.get_best_discounts')
+    def get_best_discounts(self, lines):
+        return super().get_best_discounts(lines)
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    @profiled('account.move._apply_discount_policy')
+    def _apply_discount_policy(self, reset=False):
+        return super()._apply_discount_policy(reset=reset)
+
+
+class SaleOrderLine(models.Model):
+    _inherit = 'sale.order.line'
+
+    @api.onchange('product_id', 'product_uom_qty')
+    @profiled('sale.order.line._onchange_discount_policy')
+    def _onchange_discount_policy(self):
+        return super()._onchange_discount_policy()
+
+
+class StockMove(models.Model):
+    _inherit = 'stock.move'
+
+    @profiled('stock.move._action_done')
+    def _action_done(self, cancel_backorder=False):
+        return super()._action_done(cancel_backorder=cancel_backorder)
@@ -0,0 +1 @@
+from . import test_hotpath_profiler
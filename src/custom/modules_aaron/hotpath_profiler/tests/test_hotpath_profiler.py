@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase, tagged
+
+from ..models import hotpath_profile_stat
+
+
+@tagged('post_install', '-at_install')
+class TestHotpathProfiler(TransactionCase):
+
+    def setUp(self):
+        super(TestHotpathProfiler, self).setUp()
+        self.Stat = self.env['hotpath.profile.stat']
+        self.ICP = self.env['ir.config_parameter'].sudo()
+        hotpath_profile_stat._buffers.pop(self.env.cr.dbname, None)
+        # Sin volcados automáticos con cursor propio durante el test
+        hotpath_profile_stat._next_flush[self.env.cr.dbname] = float('inf')
+        self.addCleanup(hotpath_profile_stat._next_flush.pop, self.env.cr.dbname, None)
+        self.addCleanup(hotpath_profile_stat._buffers.pop, self.env.cr.dbname, None)
+
+        self.product = self.env['product.product'].create({'name': 'Producto Perfilado', 'list_price': 100})
+        self.partner = self.env['res.partner'].create({'name': 'Cliente Perfilado'})
+
+    def _stat(self, entry_point):
+        self.Stat._flush_buffer(self.env.cr)
+        return self.Stat.search([('entry_point', '=', entry_point)])
+
+    def test_01_disabled_by_default(self):
+        """ Con el parámetro desactivado no se acumula nada. """
+        self.ICP.set_param('hotpath_profiler.enabled', 'False')
+        self.env['discount.policy.rule'].get_best_discount(self.partner, self.product, 1)
+        self.assertFalse(hotpath_profile_stat._buffers.get(self.env.cr.dbname))
+
+    def test_02_records_calls_and_percentiles(self):
+        """ Cada llamada suma al contador, las consultas y el histograma. """
+        self.ICP.set_param('hotpath_profiler.enabled', 'True')
+        Rule = self.env['discount.policy.rule']
+        for _i in range(3):
+            Rule.get_best_discount(self.partner, self.product, 1)
+
+        stat = self._stat('discount.policy.rule.get_best_discount')
+        self.assertEqual(stat.call_count, 3)
+        self.assertEqual(sum(int(count) for count in stat.histogram.split(',')), 3)
+        self.assertLessEqual(stat.p50_ms, stat.p99_ms)
+        self.assertGreater(stat.avg_ms, 0.0)
+
+        # Los volcados siguientes se suman a la misma fila
+        Rule.get_best_discount(self.partner, self.product, 1)
+        stat = self._stat('discount.policy.rule.get_best_discount')
+        self.assertEqual(stat.call_count, 4)
+        self.assertEqual(sum(int(count) for count in stat.histogram.split(',')), 4)
+
+    def test_03_action_done_is_profiled(self):
+        """ La validación de movimientos registra llamadas y consultas SQL. """
+        self.ICP.set_param('hotpath_profiler.enabled', 'True')
+        product = self.env['product.product'].create({'name': 'Producto Stock Perfilado', 'detailed_type': 'product'})
+        stock_location = self.env.ref('stock.stock_location_stock')
+        customer_location = self.env.ref('stock.stock_location_customers')
+        self.env['stock.quant']._update_available_quantity(product, stock_location, 10.0)
+
+        move = self.env['stock.move'].create({
+            'name': 'Movimiento Perfilado',
+            'product_id': product.id,
+            'product_uom_qty': 1.0,
+            'product_uom': product.uom_id.id,
+            'location_id': stock_location.id,
+            'location_dest_id': customer_location.id,
+        })
+        move._action_confirm()
+        move._action_assign()
+        move.quantity = 1.0
+        move.picked = True
+        move._action_done()
+
+        stat = self._stat('stock.move._action_done')
+        self.assertGreaterEqual(stat.call_count, 1)
+        self.assertGreater(stat.queries_per_call, 0)
+
+    def test_04_reset(self):
+        """ Reiniciar borra las filas y lo acumulado en memoria. """
+        self.ICP.set_param('hotpath_profiler.enabled', 'True')
+        self.env['discount.policy.rule'].get_best_discount(self.partner, self.product, 1)
+        self.Stat._flush_buffer(self.env.cr)
+        self.Stat.action_reset_stats()
+        self.assertFalse(self.Stat.search([]))
+        self.assertEqual(self.Stat.get_stats(), [])
+
+    def test_05_reapply_cron_through_profiled_override(self):
+        """ El cron de reaplicación pasa reset a través del override perfilado. """
+        self.ICP.set_param('hotpath_profiler.enabled', 'True')
+        policy = self.env['discount.policy'].create({'name': 'Política Perfilada'})
+        rule = self.env['discount.policy.rule'].create({
+            'policy_id': policy.id,
+            'product_id': self.product.id,
+            'min_quantity': 1,
+            'discount_percentage': 10.0,
+        })
+        invoice = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': self.partner.id,
+            'invoice_line_ids': [(0, 0, {'product_id': self.product.id, 'quantity': 1, 'price_unit': 100})],
+        })
+        invoice._apply_discount_policy()
+        self.assertEqual(invoice.invoice_line_ids.discount, 10.0)
+
+        rule.discount_percentage = 4.0
+        policy.action_reapply_open_documents()
+        self.env['discount.policy']._cron_reapply_discount_policy()
+
+        self.assertEqual(invoice.invoice_line_ids.discount, 4.0)
+        self.assertGreaterEqual(self._stat('account.move._apply_discount_policy').call_count, 2)
@@ -15,11 +15,17 @@ Long description of module's purpose
     'version': '17.0.0.1',
 
     'depends': ['base', 'stock', 'sale_management'],
+    'external_dependencies': {
+        'python': ['numpy'],
+    },
 
     'data': [
         'security/ir.model.access.csv',
         'views/views.xml',
         'views/product_views.xml',
+        'views/low_stock_alert_views.xml',
+        'data/ir_config_parameter_data.xml',
+        'data/ir_cron_data.xml',
     ],
     'installable': True,
     'application': True,
@@ -1,3 +1,69 @@
 # -*- coding: utf-8 -*-
+import time
+
 from odoo import http
+from odoo.http import request
+from odoo.tools.lru import LRU
+
+# Resumen por categoría del tablero. La instantánea por producto ya se
+# mantiene de forma incremental en campos almacenados; aquí sólo se evita
+# repetir la agregación en cada apertura durante DASHBOARD_CACHE_TTL segundos.
+DASHBOARD_CACHE_TTL = 60
+DASHBOARD_PAGE_SIZE = 40
+_summary_cache = LRU(256)
+
+
+class InventoryAlertsController(http.Controller):
+
+    def _get_dashboard_summary(self):
+        env = request.env
+        key = (env.cr.dbname, env.uid, tuple(env.companies.ids))
+        cached = _summary_cache.get(key)
+        if cached and time.monotonic() - cached[0] < DASHBOARD_CACHE_TTL:
+            return cached[1]
+
+        groups = env['product.template']._read_group(
+            [('is_low_stock', '=', True)],
+            ['categ_id'],
+            ['__count', 'low_stock_shortage:sum'],
+        )
+        categories = [{
+            'id': category.id,
+            'name': category.display_name,
+            'count': count,
+            'shortage': shortage,
+        } for category, count, shortage in groups]
+        summary = {
+            'categories': sorted(categories, key=lambda category: -category['count']),
+            'total_count': sum(category['count'] for category in categories),
+            'total_shortage': sum(category['shortage'] for category in categories),
+        }
+        _summary_cache[key] = (time.monotonic(), summary)
+        return summary
+
+    @http.route('/inventory_alerts/dashboard', type='json', auth='user')
+    def dashboard(self, category_id=None, offset=0, limit=DASHBOARD_PAGE_SIZE):
+        """
+        Datos del tablero de Stock Crítico: conteos y faltantes por categoría
+        y una página de productos, todo leído de la instantánea almacenada.
+        Las imágenes no se envían: cada fila trae la URL para cargarla a demanda.
+        """
+        domain = [('is_low_stock', '=', True)]
+        if category_id:
+            domain.append(('categ_id', '=', int(category_id)))
+
+        templates = request.env['product.template'].search_read(
+            domain,
+            ['name', 'categ_id', 'low_stock_qty_available', 'minimal_stock', 'low_stock_shortage'],
+            offset=int(offset),
+            limit=min(int(limit), 200),
+            order='low_stock_shortage desc, id',
+        )
+        for template in templates:
+            template['image_url'] = '/web/image/product.template/%s/image_128' % template['id']
 
+        return {
+            'summary': self._get_dashboard_summary(),
+            'products': templates,
+            'offset': int(offset),
+        }
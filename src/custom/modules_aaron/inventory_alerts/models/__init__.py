@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
 
+from . import alert_notification
+from . import forecast
 from . import inventory
+from . import low_stock_alert
 from . import products
+from . import warehouse_minimum
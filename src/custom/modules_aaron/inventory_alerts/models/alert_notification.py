@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import defaultdict
+
+from odoo import models, fields, api
+from odoo.tools import Markup
+
+# Notificaciones procesadas por cada commit del cron
+DISPATCH_BATCH_SIZE = 500
+
+
+class StockAlertNotification(models.Model):
+    _name = 'stock.alert.notification'
+    _description = 'Cola de Notificaciones de Stock'
+    _order = 'id'
+
+    alert_id = fields.Many2one('stock.low.stock.alert', string="Alerta", required=True, ondelete='cascade')
+    kind = fields.Selection([
+        ('open', "Alerta"),
+        ('resolved', "Recuperación"),
+    ], string="Tipo", required=True)
+    picking_id = fields.Many2one('stock.picking', string="Transferencia", ondelete='set null')
+    partner_id = fields.Many2one('res.partner', string="Destinatario", ondelete='cascade')
+    qty_available = fields.Float(string="Stock")
+    minimal_stock = fields.Float(string="Stock Mínimo")
+
+    @api.model
+    def _enqueue(self, opened, resolved, moves):
+        """
+        Encola las notificaciones de las alertas que cambiaron de estado.
+        Las filas se crean dentro de la transacción de validación: si ésta se
+        revierte, la cola también, y no se envía nada.
+        """
+        pickings_by_product = defaultdict(lambda: self.env['stock.picking'])
+        for move in moves:
+            pickings_by_product[move.product_id.id] |= move.picking_id
+
+        vals_list = []
+        for alert in opened:
+            pickings = pickings_by_product.get(alert.product_id.id)
+            for picking in pickings or [self.env['stock.picking']]:
+                vals_list.append({
+                    'alert_id': alert.id,
+                    'kind': 'open',
+                    'picking_id': picking.id,
+                    'partner_id': self.env.user.partner_id.id,
+                    'qty_available': alert.qty_available,
+                    'minimal_stock': alert.minimal_stock,
+                })
+        for alert in resolved:
+            vals_list.append({
+                'alert_id': alert.id,
+                'kind': 'resolved',
+                'qty_available': alert.qty_available,
+                'minimal_stock': alert.minimal_stock,
+            })
+
+        self.sudo().create(vals_list)
+        # El disparo del cron también es transaccional y se notifica al confirmar
+        self.env.ref('inventory_alerts.ir_cron_dispatch_stock_alerts')._trigger()
+
+    @api.model
+    def _cron_dispatch_notifications(self, batch_size=DISPATCH_BATCH_SIZE):
+        """ Vacía la cola por bloques, confirmando cada bloque por separado. """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        while True:
+            batch = self.sudo().search([], limit=batch_size)
+            if not batch:
+                break
+            batch._dispatch()
+            batch.unlink()
+            if auto_commit:
+                self.env.cr.commit()
+
+    def _dispatch(self):
+        """
+        Envía las notificaciones del bloque agrupadas: una notificación de bus
+        por destinatario, un resumen por picking, un mensaje por producto y
+        plantilla, y una nota por cada alerta resuelta.
+        """
+        opened = self.filtered(lambda notification: notification.kind == 'open')
+        resolved = self - opened
+        header = Markup("<b>ALERTA DE STOCK BAJO</b><br/>")
+
+        def alert_line(notification):
+            product = notification.alert_id.product_id
+            line = Markup(
+                "El producto <a href='#' data-oe-model='product.product' data-oe-id='{}'>{}</a> "
+                "ha quedado con stock <b>{}</b> (Mínimo: {})"
+            ).format(product.id, product.name, notification.qty_available, notification.minimal_stock)
+            if notification.alert_id.warehouse_id:
+                line += Markup(" en el almacén {}").format(notification.alert_id.warehouse_id.name)
+            return line + "."
+
+        # Una notificación de bus por destinatario
+        by_partner = defaultdict(lambda: self.browse())
+        for notification in opened.filtered('partner_id'):
+            by_partner[notification.partner_id] |= notification
+        for partner, notifications in by_partner.items():
+            self.env['bus.bus']._sendone(partner, 'simple_notification', {
+                'type': 'warning',
+                'title': "Stock Mínimo Alcanzado",
+                'message': "\n".join(
+                    f"El producto {notification.alert_id.product_id.name} ha bajado de su stock mínimo "
+                    f"({notification.minimal_stock}"
+                    f"{', ' + notification.alert_id.warehouse_id.name if notification.alert_id.warehouse_id else ''}). "
+                    f"Actual: {notification.qty_available}"
+                    for notification in notifications
+                ),
+                'sticky': False,
+            })
+
+        # Un resumen por picking con los productos afectados
+        by_picking = defaultdict(lambda: self.browse())
+        for notification in opened.filtered('picking_id'):
+            by_picking[notification.picking_id] |= notification
+        for picking, notifications in by_picking.items():
+            if len(notifications) == 1:
+                body = header + alert_line(notifications)
+            else:
+                body = header + Markup("<ul>{}</ul>").format(
+                    Markup().join(Markup("<li>{}</li>").format(alert_line(notification)) for notification in notifications)
+                )
+            picking.message_post(
+                body=body,
+                subject="Alerta de Stock Mínimo",
+                message_type='comment',
+                subtype_xmlid='mail.mt_note'
+            )
+
+        # Un mensaje por producto y por plantilla (una vez por alerta)
+        seen_alerts = set()
+        for notification in opened:
+            if notification.alert_id in seen_alerts:
+                continue
+            seen_alerts.add(notification.alert_id)
+            product = notification.alert_id.product_id
+            body = header + alert_line(notification)
+            product.message_post(
+                body=body,
+                subject="Alerta de Stock Mínimo",
+                message_type='comment',
+                subtype_xmlid='mail.mt_note'
+            )
+            product.product_tmpl_id.message_post(
+                body=body,
+                subject="Alerta de Stock Mínimo",
+                message_type='comment',
+                subtype_xmlid='mail.mt_note'
+            )
+
+        for notification in resolved:
+            product = notification.alert_id.product_id
+            product.product_tmpl_id.message_post(
+                body=Markup(
+                    "<b>STOCK RECUPERADO</b><br/>"
+                    "El producto {} volvió a tener stock <b>{}</b> (Mínimo: {})."
+                ).format(product.display_name, notification.qty_available, notification.minimal_stock),
+                subject="Stock Recuperado",
+                message_type='comment',
+                subtype_xmlid='mail.mt_note'
+            )
@@ -1,54 +1,52 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
-from odoo.tools import Markup
 
 class StockMove(models.Model):
     _inherit = 'stock.move'
 
     def _action_done(self, cancel_backorder=False):
         res = super(StockMove, self)._action_done(cancel_backorder=cancel_backorder)
+        self._check_low_stock_alerts()
+        return res
 
-        for move in self:
-            if move.product_id.detailed_type == 'product':
-                product = move.product_id
-                
-                #Validación 
-                if product.minimal_stock > 0 and product.qty_available < product.minimal_stock:
-                    
-                    msg = Markup(
-                        f"<b>ALERTA DE STOCK BAJO</b><br/>"
-                        f"El producto <a href='#' data-oe-model='product.product' data-oe-id='{product.id}'>{product.name}</a> "
-                        f"ha quedado con stock <b>{product.qty_available}</b> "
-                        f"(Mínimo: {product.minimal_stock})."
-                    )
-
-                    self.env['bus.bus']._sendone(self.env.user.partner_id, 'simple_notification', {
-                        'type': 'warning',
-                        'title': "Stock Mínimo Alcanzado",
-                        'message': f"El producto {product.name} ha bajado de su stock mínimo ({product.minimal_stock}). Actual: {product.qty_available}",
-                        'sticky': False,
-                    })
-
-                    if move.picking_id:
-                        move.picking_id.message_post(
-                            body=msg,
-                            subject="Alerta de Stock Mínimo",
-                            message_type='comment',
-                            subtype_xmlid='mail.mt_note'
-                        )
-                    
-                    product.sudo().message_post(
-                        body=msg,
-                        subject="Alerta de Stock Mínimo",
-                        message_type='comment',
-                        subtype_xmlid='mail.mt_note'
-                    )
-
-                    product.product_tmpl_id.sudo().message_post(
-                        body=msg,
-                        subject="Alerta de Stock Mínimo",
-                        message_type='comment',
-                        subtype_xmlid='mail.mt_note'
-                    )
-
-        return res
\ No newline at end of file
+    def _check_low_stock_alerts(self):
+        """
+        Evalúa el stock mínimo global y por almacén una sola vez por producto
+        distinto, con lecturas agrupadas de quants para todos los productos.
+        Sólo se notifica cuando una alerta cambia de estado. Las notificaciones
+        se encolan en la misma transacción y se envían después del commit.
+        """
+        products = self.product_id
+        if not products:
+            return
+
+        opened, resolved = self.env['stock.low.stock.alert']._check_products(products)
+        if opened or resolved:
+            self.env['stock.alert.notification']._enqueue(opened, resolved, self)
+
+
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        quants = super().create(vals_list)
+        quants._mark_low_stock_to_compute()
+        return quants
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'quantity' in vals or 'location_id' in vals:
+            self._mark_low_stock_to_compute()
+        return res
+
+    def unlink(self):
+        templates = self.product_id.product_tmpl_id
+        res = super().unlink()
+        templates.exists()._mark_low_stock_to_compute()
+        return res
+
+    def _mark_low_stock_to_compute(self):
+        """ Agenda el recálculo de is_low_stock de las plantillas afectadas para el próximo flush. """
+        templates = self.product_id.product_tmpl_id
+        templates._mark_low_stock_to_compute()
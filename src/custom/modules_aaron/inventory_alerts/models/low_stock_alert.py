@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+# Margen de recuperación por defecto (%) sobre el stock mínimo
+DEFAULT_RECOVERY_MARGIN = 10.0
+# Solapamiento del escáner: cubre transacciones que confirman después de
+# haber escrito su write_date. Reevaluar un producto dos veces es inocuo.
+SCAN_OVERLAP = timedelta(minutes=5)
+SCAN_WATERMARK_PARAM = 'inventory_alerts.scan_watermark'
+# Productos con alertas abiertas cuyo umbral ya no existe (mínimo en 0 o
+# fila de product.warehouse.minimum borrada). Un borrado no deja write_date,
+# así que el escáner los busca siempre; las alertas abiertas son pocas.
+ORPHAN_ALERT_PRODUCTS_QUERY = """
+    SELECT alert.product_id
+      FROM stock_low_stock_alert alert
+      JOIN product_product pp ON pp.id = alert.product_id
+      JOIN product_template pt ON pt.id = pp.product_tmpl_id
+     WHERE alert.state = 'open'
+       AND CASE WHEN alert.warehouse_id IS NULL THEN COALESCE(pt.minimal_stock, 0) <= 0
+                ELSE NOT EXISTS (SELECT 1
+                                   FROM product_warehouse_minimum pwm
+                                  WHERE pwm.product_tmpl_id = pt.id
+                                    AND pwm.warehouse_id = alert.warehouse_id
+                                    AND pwm.minimal_stock > 0)
+           END
+"""
+# Productos tocados desde la marca de agua. Cada rama usa un índice por
+# write_date creado en el init() de su modelo.
+TOUCHED_PRODUCTS_QUERY = """
+    SELECT product_id FROM stock_quant WHERE write_date > %(since)s
+     UNION
+    SELECT product_id FROM stock_move WHERE write_date > %(since)s AND state = 'done'
+     UNION
+    SELECT pp.id
+      FROM product_product pp
+      JOIN product_template pt ON pt.id = pp.product_tmpl_id
+     WHERE pt.write_date > %(since)s AND pt.minimal_stock > 0
+     UNION
+    SELECT pp.id
+      FROM product_warehouse_minimum pwm
+      JOIN product_product pp ON pp.product_tmpl_id = pwm.product_tmpl_id
+     WHERE pwm.write_date > %(since)s
+     UNION
+""" + ORPHAN_ALERT_PRODUCTS_QUERY
+
+
+class LowStockAlert(models.Model):
+    _name = 'stock.low.stock.alert'
+    _description = 'Alerta de Stock Mínimo'
+    _order = 'date_open desc, id desc'
+    _rec_name = 'product_id'
+
+    product_id = fields.Many2one('product.product', string="Producto", required=True, ondelete='cascade', index=True)
+    product_tmpl_id = fields.Many2one(related='product_id.product_tmpl_id', string="Plantilla", store=True)
+    warehouse_id = fields.Many2one('stock.warehouse', string="Almacén", ondelete='cascade', index=True)
+    state = fields.Selection([
+        ('open', "Abierta"),
+        ('resolved', "Resuelta"),
+    ], string="Estado", default='open', required=True, index=True)
+    minimal_stock = fields.Float(string="Stock Mínimo")
+    qty_available = fields.Float(string="Stock Actual")
+    date_open = fields.Datetime(string="Abierta el", default=fields.Datetime.now, required=True)
+    date_resolved = fields.Datetime(string="Resuelta el")
+
+    def init(self):
+        # Como mucho una alerta abierta por producto y almacén
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS stock_low_stock_alert_open_uniq
+                ON stock_low_stock_alert (product_id, COALESCE(warehouse_id, 0))
+                WHERE state = 'open'
+        """)
+        # Índices por write_date para el escáner incremental: el conjunto de
+        # cambios se lee con un index scan, sin recorrer todo el historial.
+        # Los de product_template y product_warehouse_minimum se crean en el
+        # init() de cada modelo, cuando su tabla y columnas ya existen.
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS stock_move_done_write_date_idx
+                ON stock_move (write_date) WHERE state = 'done'
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS stock_quant_write_date_idx
+                ON stock_quant (write_date)
+        """)
+
+    def _register_hook(self):
+        super()._register_hook()
+        # Precarga en las cachés del registro el margen de recuperación y el
+        # cron de despacho, usados en cada validación de movimientos. Es sólo
+        # una optimización: si falla se registra y la carga del registro continúa.
+        try:
+            with self.env.cr.savepoint():
+                self._get_recovery_margin()
+                self.env.ref('inventory_alerts.ir_cron_dispatch_stock_alerts', raise_if_not_found=False)
+        except Exception:
+            _logger.warning("No se pudieron precargar las cachés de alertas de stock", exc_info=True)
+
+    @api.model
+    def _get_recovery_margin(self):
+        """ Margen (%) sobre el mínimo que el stock debe superar para cerrar la alerta. """
+        return float(self.env['ir.config_parameter'].sudo().get_param(
+            'inventory_alerts.recovery_margin', DEFAULT_RECOVERY_MARGIN))
+
+    @api.model
+    def _update_alerts(self, quantities, thresholds, warehouse=None):
+        """
+        Aplica las transiciones de estado para los productos evaluados.
+        Abre una alerta cuando el stock cae bajo el mínimo y la resuelve sólo
+        cuando supera el mínimo más el margen de recuperación (histéresis).
+        Si la alerta ya está abierta sólo se actualiza la cantidad.
+        :param quantities: Diccionario {product_id: cantidad disponible}
+        :param thresholds: Diccionario {product_id: stock mínimo}
+        :param warehouse: Almacén evaluado, o vacío para el stock global
+        :return: Tupla (alertas abiertas, alertas resueltas) en esta llamada
+        """
+        warehouse = warehouse or self.env['stock.warehouse']
+        margin = self._get_recovery_margin() / 100.0
+        open_alerts = self.sudo().search([
+            ('product_id', 'in', list(quantities)),
+            ('warehouse_id', '=', warehouse.id),
+            ('state', '=', 'open'),
+        ])
+        open_by_product = {alert.product_id.id: alert for alert in open_alerts}
+
+        to_create = []
+        resolved = self.browse()
+        now = fields.Datetime.now()
+        for product_id, quantity in quantities.items():
+            minimal_stock = thresholds[product_id]
+            alert = open_by_product.get(product_id)
+            if alert:
+                if quantity >= minimal_stock * (1 + margin):
+                    alert.write({'state': 'resolved', 'date_resolved': now, 'qty_available': quantity})
+                    resolved |= alert
+                elif alert.qty_available != quantity:
+                    alert.qty_available = quantity
+            elif minimal_stock > 0 and quantity < minimal_stock:
+                to_create.append({
+                    'product_id': product_id,
+                    'warehouse_id': warehouse.id,
+                    'minimal_stock': minimal_stock,
+                    'qty_available': quantity,
+                    'date_open': now,
+                })
+
+        opened = self._insert_open_alerts(to_create)
+        return opened, resolved
+
+    @api.model
+    def _insert_open_alerts(self, vals_list):
+        """
+        Crea las alertas abiertas con INSERT ... ON CONFLICT DO NOTHING sobre
+        el índice único de alertas abiertas. Si dos validaciones concurrentes
+        abren la misma alerta, la segunda no falla con UniqueViolation: la
+        fila se omite, o PostgreSQL devuelve un error de serialización que
+        Odoo reintenta y en el reintento la alerta ya está abierta.
+        :param vals_list: Lista de dict con product_id, warehouse_id,
+            minimal_stock, qty_available y date_open
+        :return: Las alertas efectivamente creadas
+        """
+        if not vals_list:
+            return self.browse()
+
+        # Las resoluciones pendientes de esta transacción deben estar en la base
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO stock_low_stock_alert
+                (product_id, product_tmpl_id, warehouse_id, state, minimal_stock, qty_available,
+                 date_open, create_uid, write_uid, create_date, write_date)
+            SELECT pp.id, pp.product_tmpl_id, v.warehouse_id, 'open', v.minimal_stock, v.qty_available,
+                   v.date_open, %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+              FROM unnest(%(product_ids)s::int[], %(warehouse_ids)s::int[], %(minimal_stocks)s::float8[],
+                          %(quantities)s::float8[], %(dates)s::timestamp[])
+                   AS v(product_id, warehouse_id, minimal_stock, qty_available, date_open)
+              JOIN product_product pp ON pp.id = v.product_id
+            ON CONFLICT (product_id, COALESCE(warehouse_id, 0)) WHERE state = 'open' DO NOTHING
+            RETURNING id
+        """, {
+            'uid': self.env.uid,
+            'product_ids': [vals['product_id'] for vals in vals_list],
+            'warehouse_ids': [vals['warehouse_id'] or None for vals in vals_list],
+            'minimal_stocks': [vals['minimal_stock'] for vals in vals_list],
+            'quantities': [vals['qty_available'] for vals in vals_list],
+            'dates': [vals['date_open'] for vals in vals_list],
+        })
+        return self.sudo().browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _check_products(self, products):
+        """
+        Evalúa el stock global (minimal_stock) y los umbrales por almacén de
+        los productos, y aplica las transiciones de todas sus alertas.
+        :return: Tupla (alertas abiertas, alertas resueltas)
+        """
+        opened = resolved = self.browse()
+        evaluated_products = products
+        products = products.filtered(lambda product: product.detailed_type == 'product')
+        # (producto, almacén) con un umbral vigente; False es el stock global
+        with_threshold = set()
+
+        global_products = products.filtered(lambda product: product.minimal_stock > 0)
+        if global_products:
+            opened, resolved = self._update_alerts(
+                global_products._get_available_quantities(),
+                {product.id: product.minimal_stock for product in global_products},
+            )
+            with_threshold.update((product.id, False) for product in global_products)
+
+        by_warehouse = self.env['product.warehouse.minimum']._get_warehouse_quantities(products)
+        for warehouse, (quantities, thresholds) in by_warehouse.items():
+            warehouse_opened, warehouse_resolved = self._update_alerts(quantities, thresholds, warehouse)
+            opened |= warehouse_opened
+            resolved |= warehouse_resolved
+            with_threshold.update(
+                (product_id, warehouse.id) for product_id, minimal_stock in thresholds.items() if minimal_stock > 0
+            )
+
+        # Alertas abiertas cuyo umbral se puso en 0 o se borró: se resuelven
+        orphans = self.sudo().search([
+            ('product_id', 'in', evaluated_products.ids),
+            ('state', '=', 'open'),
+        ]).filtered(lambda alert: (alert.product_id.id, alert.warehouse_id.id) not in with_threshold)
+        if orphans:
+            orphans.write({'state': 'resolved', 'date_resolved': fields.Datetime.now()})
+            resolved |= orphans
+
+        return opened, resolved
+
+    @api.model
+    def _get_touched_product_ids(self, since):
+        """
+        Productos con stock o umbrales modificados desde since. Sin marca de
+        agua previa, devuelve todos los productos con algún umbral. En ambos
+        casos incluye los productos con alertas abiertas sin umbral vigente.
+        """
+        if not since:
+            self.env.cr.execute("""
+                SELECT pp.id
+                  FROM product_product pp
+                  JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                 WHERE pt.minimal_stock > 0
+                    OR EXISTS (SELECT 1 FROM product_warehouse_minimum pwm WHERE pwm.product_tmpl_id = pt.id)
+                 UNION
+            """ + ORPHAN_ALERT_PRODUCTS_QUERY)
+            return [row[0] for row in self.env.cr.fetchall()]
+
+        self.env.cr.execute(TOUCHED_PRODUCTS_QUERY, {'since': since})
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _cron_scan_low_stock(self, chunk_size=1000):
+        """
+        Escáner incremental: reevalúa sólo los productos tocados desde la
+        última ejecución (ajustes de inventario, importaciones, edición de
+        quants), por bloques y con lecturas agrupadas por bloque. Alimenta
+        las mismas alertas, la cola de notificaciones y el tablero.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        watermark = ICP.get_param(SCAN_WATERMARK_PARAM)
+        since = fields.Datetime.to_datetime(watermark) - SCAN_OVERLAP if watermark else None
+        scan_start = self.env.cr.now()
+
+        self.env.flush_all()
+        product_ids = self._get_touched_product_ids(since)
+        _logger.info("Escaneo de stock mínimo: %s productos modificados", len(product_ids))
+
+        Product = self.env['product.product'].sudo()
+        for ids in split_every(chunk_size, product_ids):
+            products = Product.browse(ids)
+            opened, resolved = self._check_products(products)
+            if opened or resolved:
+                self.env['stock.alert.notification']._enqueue(opened, resolved, self.env['stock.move'])
+            products.product_tmpl_id._mark_low_stock_to_compute()
+            self.env.flush_all()
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+        ICP.set_param(SCAN_WATERMARK_PARAM, fields.Datetime.to_string(scan_start))
+
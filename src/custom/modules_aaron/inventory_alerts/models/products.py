@@ -1,28 +1,100 @@
 from odoo import fields, models, api
+from odoo.tools import float_round
 
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
 
     minimal_stock = fields.Float(string="Stock Mínimo", default=0.0)
+    warehouse_minimum_ids = fields.One2many(
+        'product.warehouse.minimum', 'product_tmpl_id', string="Stock Mínimo por Almacén")
     
+    # Almacenado e indexado: el tablero filtra, cuenta y agrupa en SQL.
+    # Se recalcula al cambiar minimal_stock y, vía stock.quant, al cambiar
+    # las cantidades de cualquiera de sus variantes.
     is_low_stock = fields.Boolean(
-        string="Stock Crítico", 
-        compute='_compute_is_low_stock', 
-        search='_search_is_low_stock'
+        string="Stock Crítico",
+        compute='_compute_is_low_stock',
+        store=True,
+        index=True,
     )
+    # Instantánea para el tablero, mantenida junto con is_low_stock
+    low_stock_qty_available = fields.Float(
+        string="Stock (Instantánea)",
+        compute='_compute_is_low_stock',
+        store=True,
+    )
+    low_stock_shortage = fields.Float(
+        string="Faltante",
+        compute='_compute_is_low_stock',
+        store=True,
+    )
+
+    def init(self):
+        super().init()
+        # Para el escáner incremental de alertas (TOUCHED_PRODUCTS_QUERY)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS product_template_minimal_stock_write_date_idx
+                ON product_template (write_date) WHERE minimal_stock > 0
+        """)
 
-    @api.depends('qty_available', 'minimal_stock')
+    @api.depends('minimal_stock')
     def _compute_is_low_stock(self):
-        for record in self:
-            if record.minimal_stock > 0 and record.qty_available < record.minimal_stock:
-                record.is_low_stock = True
-            else:
-                record.is_low_stock = False
-
-    def _search_is_low_stock(self, operator, value):
-        if operator == '=' and value:
-            products = self.search([('minimal_stock', '>', 0)])
-            alerts = products.filtered(lambda p: p.qty_available < p.minimal_stock)
-            return [('id', 'in', alerts.ids)]
-        return []
\ No newline at end of file
+        to_check = self.filtered(lambda template: template.minimal_stock > 0)
+        (self - to_check).update({
+            'is_low_stock': False,
+            'low_stock_qty_available': 0.0,
+            'low_stock_shortage': 0.0,
+        })
+        if not to_check:
+            return
+
+        quantities = to_check._get_low_stock_quantities()
+        for record in to_check:
+            quantity = quantities.get(record.id, 0.0)
+            record.is_low_stock = quantity < record.minimal_stock
+            record.low_stock_qty_available = quantity
+            record.low_stock_shortage = max(record.minimal_stock - quantity, 0.0)
+
+    def _get_low_stock_quantities(self):
+        """
+        Stock disponible por plantilla (suma de variantes) con una lectura
+        agrupada de quants. Se evalúa en todas las compañías para que el valor
+        almacenado no dependa del usuario que dispara el recálculo.
+        :return: Diccionario {product_tmpl_id: cantidad disponible}
+        """
+        companies = self.env['res.company'].sudo().search([])
+        variants = self.sudo().with_context(allowed_company_ids=companies.ids).product_variant_ids
+        quantities = {}
+        for variant_id, quantity in variants._get_available_quantities().items():
+            template_id = variants.browse(variant_id).product_tmpl_id.id
+            quantities[template_id] = quantities.get(template_id, 0.0) + quantity
+        return quantities
+
+    def _mark_low_stock_to_compute(self):
+        templates = self.filtered(lambda template: template.minimal_stock > 0 or template.is_low_stock)
+        if templates:
+            for field_name in ('is_low_stock', 'low_stock_qty_available', 'low_stock_shortage'):
+                self.env.add_to_compute(self._fields[field_name], templates)
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def _get_available_quantities(self):
+        """
+        Equivalente a qty_available para todo el recordset con una sola
+        lectura agrupada de stock.quant sobre las ubicaciones del contexto.
+        :return: Diccionario {product_id: cantidad disponible}
+        """
+        domain_quant_loc = self._get_domain_locations()[0]
+        groups = self.env['stock.quant']._read_group(
+            [('product_id', 'in', self.ids)] + domain_quant_loc,
+            ['product_id'],
+            ['quantity:sum'],
+        )
+        quantities = {product.id: quantity for product, quantity in groups}
+        return {
+            product.id: float_round(quantities.get(product.id, 0.0), precision_rounding=product.uom_id.rounding)
+            for product in self
+        }
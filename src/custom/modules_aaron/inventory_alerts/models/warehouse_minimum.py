@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+from odoo import models, fields, api
+from odoo.tools import float_round
+
+
+class ProductWarehouseMinimum(models.Model):
+    _name = 'product.warehouse.minimum'
+    _description = 'Stock Mínimo por Almacén'
+    _order = 'warehouse_id'
+
+    product_tmpl_id = fields.Many2one('product.template', string="Producto", required=True, ondelete='cascade', index=True)
+    warehouse_id = fields.Many2one('stock.warehouse', string="Almacén", required=True, ondelete='cascade', index=True)
+    company_id = fields.Many2one(related='warehouse_id.company_id', store=True)
+    minimal_stock = fields.Float(string="Stock Mínimo", required=True, default=0.0)
+
+    _sql_constraints = [
+        ('product_warehouse_uniq', 'unique(product_tmpl_id, warehouse_id)',
+         "Sólo puede haber un stock mínimo por producto y almacén."),
+    ]
+
+    def init(self):
+        # Para el escáner incremental de alertas (TOUCHED_PRODUCTS_QUERY)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS product_warehouse_minimum_write_date_idx
+                ON product_warehouse_minimum (write_date)
+        """)
+
+    @api.model
+    def _get_warehouse_quantities(self, products):
+        """
+        Evalúa todos los umbrales por almacén de los productos en una pasada:
+        una búsqueda de umbrales y una sola lectura agrupada de stock.quant
+        para todos los productos y almacenes involucrados.
+        :return: Diccionario {warehouse: ({product_id: cantidad}, {product_id: mínimo})}
+        """
+        minimums = self.sudo().search([('product_tmpl_id', 'in', products.product_tmpl_id.ids)])
+        if not minimums:
+            return {}
+
+        groups = self.env['stock.quant'].sudo()._read_group(
+            [
+                ('product_id', 'in', products.ids),
+                ('location_id.usage', '=', 'internal'),
+                ('location_id.warehouse_id', 'in', minimums.warehouse_id.ids),
+            ],
+            ['product_id', 'location_id'],
+            ['quantity:sum'],
+        )
+        stock = {}
+        for product, location, quantity in groups:
+            key = (product.id, location.warehouse_id.id)
+            stock[key] = stock.get(key, 0.0) + quantity
+
+        # Variantes por plantilla, armado una sola vez
+        variants_by_template = defaultdict(list)
+        for product in products:
+            variants_by_template[product.product_tmpl_id.id].append(product)
+
+        result = {}
+        for minimum in minimums:
+            warehouse = minimum.warehouse_id
+            for product in variants_by_template[minimum.product_tmpl_id.id]:
+                quantities, thresholds = result.setdefault(warehouse, ({}, {}))
+                quantities[product.id] = float_round(
+                    stock.get((product.id, warehouse.id), 0.0), precision_rounding=product.uom_id.rounding)
+                thresholds[product.id] = minimum.minimal_stock
+        return result
@@ -1 +1,2 @@
 from . import test_inventory_alerts
+from . import test_inventory_alerts_performance
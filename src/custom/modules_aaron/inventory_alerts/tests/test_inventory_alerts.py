@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo import fields
 from odoo.tests.common import TransactionCase, tagged
 
 @tagged('post_install', '-at_install')
@@ -52,6 +55,17 @@ class TestInventoryAlerts(TransactionCase):
         # Establecer cantidad hecha y validar
         move.quantity = 15.0
         picking.button_validate()
+
+        # Las notificaciones se encolan y no se envían dentro de la transacción
+        queued = self.env['stock.alert.notification'].search([('picking_id', '=', picking.id)])
+        self.assertTrue(queued, "La alerta debería quedar en cola")
+        self.assertFalse(self.env['mail.message'].search([
+            ('model', '=', 'stock.picking'),
+            ('res_id', '=', picking.id),
+            ('body', 'ilike', 'ALERTA DE STOCK BAJO'),
+        ]), "No se debería enviar nada antes de vaciar la cola")
+        self.env['stock.alert.notification']._cron_dispatch_notifications()
+        self.assertFalse(queued.exists(), "La cola debería quedar vacía")
         
         # Verificar que el stock bajó a 5.0
         self.assertEqual(self.product.qty_available, 5.0, "El stock debería ser 5.0")
@@ -101,6 +115,7 @@ class TestInventoryAlerts(TransactionCase):
         picking.action_assign()
         move.quantity = 5.0
         picking.button_validate()
+        self.env['stock.alert.notification']._cron_dispatch_notifications()
         
         self.assertEqual(self.product.qty_available, 15.0)
         
@@ -134,6 +149,7 @@ class TestInventoryAlerts(TransactionCase):
         
         # Validamos. Esto debería llamar a _action_done una vez.
         picking.button_validate()
+        self.env['stock.alert.notification']._cron_dispatch_notifications()
         
         # Verificación: Stock final debe ser 5.0
         self.assertEqual(self.product.qty_available, 5.0)
@@ -158,3 +174,238 @@ class TestInventoryAlerts(TransactionCase):
         
         self.assertEqual(len(product_messages), 1, "Debería haber una alerta en el template en este contexto aislado")
 
+    def test_single_digest_per_picking(self):
+        """ Verificar que varios movimientos del mismo producto generan un único resumen """
+        product_2 = self.env['product.product'].create({
+            'name': 'Test Product Alert 2',
+            'detailed_type': 'product',
+            'minimal_stock': 10.0,
+        })
+        self.env['stock.quant']._update_available_quantity(product_2, self.stock_location, 12.0)
+        customer_location = self.env.ref('stock.stock_location_customers')
+
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+            'location_id': self.stock_location.id,
+            'location_dest_id': customer_location.id,
+        })
+        moves = self.env['stock.move'].create([{
+            'name': 'Move Digest',
+            'product_id': product.id,
+            'product_uom_qty': qty,
+            'product_uom': product.uom_id.id,
+            'picking_id': picking.id,
+            'location_id': self.stock_location.id,
+            'location_dest_id': customer_location.id,
+        } for product, qty in [(self.product, 8.0), (self.product, 7.0), (product_2, 5.0)]])
+
+        picking.action_confirm()
+        picking.action_assign()
+        for move in moves:
+            move.quantity = move.product_uom_qty
+        picking.button_validate()
+        self.env['stock.alert.notification']._cron_dispatch_notifications()
+
+        messages = self.env['mail.message'].search([
+            ('model', '=', 'stock.picking'),
+            ('res_id', '=', picking.id),
+            ('body', 'ilike', 'ALERTA DE STOCK BAJO'),
+        ])
+        self.assertEqual(len(messages), 1, "Debería haber un único resumen en el picking")
+        self.assertIn('Test Product Alert 2', messages.body)
+
+        product_messages = self.env['mail.message'].search([
+            ('model', '=', 'product.product'),
+            ('res_id', '=', self.product.id),
+            ('body', 'ilike', 'ALERTA DE STOCK BAJO'),
+        ])
+        self.assertEqual(len(product_messages), 1, "Debería haber una única alerta por producto")
+
+    def test_is_low_stock_stored_and_incremental(self):
+        """ Verificar que is_low_stock se mantiene al cambiar quants y stock mínimo """
+        template = self.product.product_tmpl_id
+        ProductTemplate = self.env['product.template']
+        self.assertFalse(template.is_low_stock)
+
+        # Bajar el stock a 5 (< 10) directamente en quants
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock_location, -15.0)
+        self.assertTrue(template.is_low_stock)
+        self.assertEqual(template.low_stock_qty_available, 5.0)
+        self.assertEqual(template.low_stock_shortage, 5.0)
+        self.assertIn(template, ProductTemplate.search([('is_low_stock', '=', True)]))
+
+        # Bajar el mínimo por debajo del stock actual
+        template.minimal_stock = 4.0
+        self.assertFalse(template.is_low_stock)
+        self.assertNotIn(template, ProductTemplate.search([('is_low_stock', '=', True)]))
+
+        # Reponer y volver a subir el mínimo
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock_location, 10.0)
+        template.minimal_stock = 20.0
+        self.assertTrue(template.is_low_stock)
+
+    def _validate_out_picking(self, qty):
+        customer_location = self.env.ref('stock.stock_location_customers')
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': self.env.ref('stock.picking_type_out').id,
+            'location_id': self.stock_location.id,
+            'location_dest_id': customer_location.id,
+        })
+        move = self.env['stock.move'].create({
+            'name': 'Move Out',
+            'product_id': self.product.id,
+            'product_uom_qty': qty,
+            'product_uom': self.product.uom_id.id,
+            'picking_id': picking.id,
+            'location_id': self.stock_location.id,
+            'location_dest_id': customer_location.id,
+        })
+        picking.action_confirm()
+        picking.action_assign()
+        move.quantity = qty
+        picking.button_validate()
+        self.env['stock.alert.notification']._cron_dispatch_notifications()
+        return picking
+
+    def test_alert_only_on_state_transition(self):
+        """ Verificar que un producto que ya está bajo el mínimo no vuelve a generar mensajes """
+        first_picking = self._validate_out_picking(15.0)
+        second_picking = self._validate_out_picking(1.0)
+        self.assertEqual(self.product.qty_available, 4.0)
+
+        alerts = self.env['stock.low.stock.alert'].search([('product_id', '=', self.product.id)])
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts.state, 'open')
+        self.assertEqual(alerts.qty_available, 4.0)
+
+        for picking, expected in [(first_picking, 1), (second_picking, 0)]:
+            count = self.env['mail.message'].search_count([
+                ('model', '=', 'stock.picking'),
+                ('res_id', '=', picking.id),
+                ('body', 'ilike', 'ALERTA DE STOCK BAJO'),
+            ])
+            self.assertEqual(count, expected)
+
+    def test_alert_recovery_margin(self):
+        """ Verificar que la alerta se resuelve sólo al superar el mínimo más el margen """
+        self.env['ir.config_parameter'].sudo().set_param('inventory_alerts.recovery_margin', 10)
+        Alert = self.env['stock.low.stock.alert']
+        thresholds = {self.product.id: 10.0}
+
+        opened, resolved = Alert._update_alerts({self.product.id: 5.0}, thresholds)
+        self.assertEqual(opened.product_id, self.product)
+
+        # 10.5 no supera 10 + 10%: la alerta sigue abierta
+        opened, resolved = Alert._update_alerts({self.product.id: 10.5}, thresholds)
+        self.assertFalse(opened or resolved)
+
+        opened, resolved = Alert._update_alerts({self.product.id: 11.0}, thresholds)
+        self.assertEqual(resolved.state, 'resolved')
+
+    def test_concurrent_alert_creation(self):
+        """ Verificar que abrir una alerta ya abierta por otra transacción no falla """
+        Alert = self.env['stock.low.stock.alert']
+        existing = Alert.create({'product_id': self.product.id, 'minimal_stock': 10.0, 'qty_available': 5.0})
+
+        # Lo que haría una validación concurrente que no vio la alerta existente
+        opened = Alert._insert_open_alerts([{
+            'product_id': self.product.id,
+            'warehouse_id': False,
+            'minimal_stock': 10.0,
+            'qty_available': 4.0,
+            'date_open': fields.Datetime.now(),
+        }])
+        self.assertFalse(opened)
+        self.assertEqual(Alert.search([('product_id', '=', self.product.id), ('state', '=', 'open')]), existing)
+
+    def test_warehouse_minimum(self):
+        """ Verificar los umbrales por almacén con una sola evaluación """
+        Alert = self.env['stock.low.stock.alert']
+        warehouse = self.stock_location.warehouse_id
+        other_warehouse = self.env['stock.warehouse'].create({'name': 'Almacén Test', 'code': 'WHT'})
+        self.env['product.warehouse.minimum'].create([
+            {'product_tmpl_id': self.product.product_tmpl_id.id, 'warehouse_id': warehouse.id, 'minimal_stock': 5.0},
+            {'product_tmpl_id': self.product.product_tmpl_id.id, 'warehouse_id': other_warehouse.id, 'minimal_stock': 3.0},
+        ])
+
+        # 20 unidades en el almacén principal, 0 en el nuevo
+        opened, resolved = Alert._check_products(self.product)
+        self.assertEqual(opened.warehouse_id, other_warehouse)
+        self.assertEqual(opened.qty_available, 0.0)
+
+        self.env['stock.quant']._update_available_quantity(self.product, other_warehouse.lot_stock_id, 4.0)
+        opened, resolved = Alert._check_products(self.product)
+        self.assertFalse(opened)
+        self.assertEqual(resolved.warehouse_id, other_warehouse)
+
+    def test_incremental_scan(self):
+        """ Verificar que el escáner detecta cambios de stock hechos fuera de _action_done """
+        Alert = self.env['stock.low.stock.alert']
+        Alert._cron_scan_low_stock()
+        self.assertFalse(Alert.search([('product_id', '=', self.product.id)]))
+
+        # Edición directa del quant, sin movimiento de stock
+        quant = self.env['stock.quant'].search([
+            ('product_id', '=', self.product.id),
+            ('location_id', '=', self.stock_location.id),
+        ])
+        quant.sudo().quantity = 2.0
+
+        Alert._cron_scan_low_stock()
+        alert = Alert.search([('product_id', '=', self.product.id), ('state', '=', 'open')])
+        self.assertEqual(alert.qty_available, 2.0)
+        self.assertTrue(self.env['stock.alert.notification'].search([('alert_id', '=', alert.id)]))
+        self.assertTrue(self.product.product_tmpl_id.is_low_stock)
+
+    def test_alert_resolved_when_threshold_removed(self):
+        """ Verificar que las alertas abiertas se resuelven al quitar el umbral """
+        Alert = self.env['stock.low.stock.alert']
+        warehouse = self.stock_location.warehouse_id
+        minimum = self.env['product.warehouse.minimum'].create({
+            'product_tmpl_id': self.product.product_tmpl_id.id,
+            'warehouse_id': warehouse.id,
+            'minimal_stock': 5.0,
+        })
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock_location, -18.0)
+        opened, resolved = Alert._check_products(self.product)
+        self.assertEqual(len(opened), 2)
+
+        # Mínimo global en 0: se resuelve al evaluar el producto
+        self.product.minimal_stock = 0.0
+        opened, resolved = Alert._check_products(self.product)
+        self.assertFalse(opened)
+        self.assertEqual(resolved.mapped('warehouse_id'), self.env['stock.warehouse'])
+
+        # Umbral por almacén borrado: el escáner lo encuentra aunque no haya write_date
+        minimum.unlink()
+        Alert._cron_scan_low_stock()
+        self.assertFalse(Alert.search([('product_id', '=', self.product.id), ('state', '=', 'open')]))
+
+    def test_register_hook_survives_errors(self):
+        """ Verificar que un error al precargar cachés no interrumpe la carga del registro """
+        Alert = self.env['stock.low.stock.alert']
+        with patch.object(type(Alert), '_get_recovery_margin', side_effect=ValueError):
+            with self.assertLogs('odoo.addons.inventory_alerts.models.low_stock_alert', level='WARNING'):
+                Alert._register_hook()
+        self.assertEqual(Alert._get_recovery_margin(), 10.0)
+
+    def test_forecast_stockout_risk(self):
+        """ Verificar el pronóstico de días de cobertura con el plazo del proveedor """
+        self.env['ir.config_parameter'].sudo().set_param('inventory_alerts.forecast_history_days', 90)
+        self._validate_out_picking(15.0)
+        template = self.product.product_tmpl_id
+        ProductTemplate = self.env['product.template']
+
+        # 15 unidades en 90 días y 5 en stock: 30 días de cobertura
+        ProductTemplate._cron_forecast_stockouts()
+        self.assertAlmostEqual(template.days_of_cover, 30.0, places=1)
+        self.assertFalse(template.stockout_risk)
+
+        self.env['product.supplierinfo'].create({
+            'partner_id': self.env['res.partner'].create({'name': 'Proveedor Test'}).id,
+            'product_tmpl_id': template.id,
+            'delay': 45,
+        })
+        ProductTemplate._cron_forecast_stockouts()
+        self.assertTrue(template.stockout_risk)
+
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo.fields import Datetime
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools import SQL
+
+from ..models.low_stock_alert import TOUCHED_PRODUCTS_QUERY
+
+_logger = logging.getLogger(__name__)
+
+# Tamaños del set sintético; se pueden agrandar por variable de entorno.
+BENCH_PRODUCTS = int(os.environ.get('INVENTORY_ALERTS_BENCH_PRODUCTS', 300))
+BENCH_MOVES = int(os.environ.get('INVENTORY_ALERTS_BENCH_MOVES', 1000))
+BENCH_HISTORY = int(os.environ.get('INVENTORY_ALERTS_BENCH_HISTORY', 50000))
+# Si está definida, los resultados se escriben como JSON en esta ruta
+BENCH_OUTPUT = os.environ.get('INVENTORY_ALERTS_BENCH_OUTPUT')
+# Consultas que la evaluación de alertas puede sumar a una validación que
+# abre alertas para todos sus productos, sin importar cuántos sean
+ALERT_VALIDATION_QUERIES = 20
+
+
+@tagged('post_install', '-at_install', 'inventory_alerts_benchmark')
+class TestInventoryAlertsPerformance(TransactionCase):
+    """
+    Benchmark de inventory_alerts. Los techos de consultas hacen fallar el
+    build si se vuelve a calcular el stock movimiento por movimiento.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = {'sizes': {'products': BENCH_PRODUCTS, 'moves': BENCH_MOVES, 'history': BENCH_HISTORY}}
+
+        cls.stock_location = cls.env.ref('stock.stock_location_stock')
+        cls.customer_location = cls.env.ref('stock.stock_location_customers')
+        cls.picking_type_out = cls.env.ref('stock.picking_type_out')
+
+        # Cada producto queda con 12 unidades y un mínimo de 10
+        cls.products = cls.env['product.product'].create([{
+            'name': 'Bench Alert Product %s' % i,
+            'detailed_type': 'product',
+            'minimal_stock': 10.0,
+        } for i in range(BENCH_PRODUCTS)])
+        for product in cls.products:
+            cls.env['stock.quant']._update_available_quantity(product, cls.stock_location, 12.0)
+
+    @classmethod
+    def tearDownClass(cls):
+        report = json.dumps(cls.results, indent=2, sort_keys=True)
+        if BENCH_OUTPUT:
+            with open(BENCH_OUTPUT, 'w') as output:
+                output.write(report)
+        _logger.info("inventory_alerts benchmark:\n%s", report)
+        super().tearDownClass()
+
+    def _create_picking(self, move_count, qty):
+        products = [self.products[i % len(self.products)] for i in range(move_count)]
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': self.picking_type_out.id,
+            'location_id': self.stock_location.id,
+            'location_dest_id': self.customer_location.id,
+        })
+        self.env['stock.move'].create([{
+            'name': 'Bench Move %s' % i,
+            'product_id': product.id,
+            'product_uom_qty': qty,
+            'product_uom': product.uom_id.id,
+            'picking_id': picking.id,
+            'location_id': self.stock_location.id,
+            'location_dest_id': self.customer_location.id,
+        } for i, product in enumerate(products)])
+        return picking
+
+    def _mail_message_count(self):
+        self.env.cr.execute("SELECT COUNT(*) FROM mail_message")
+        return self.env.cr.fetchone()[0]
+
+    def _record(self, name, **values):
+        self.results[name] = values
+
+    def test_01_alert_check_is_constant(self):
+        """ Evaluar y abrir alertas cuesta lo mismo con 20 que con miles de movimientos. """
+        small = self._create_picking(20, 1.0).move_ids
+        large = self._create_picking(BENCH_MOVES, 1.0).move_ids
+        # Todo el stock bajo el mínimo: cada evaluación abre alertas y las encola
+        quants = self.env['stock.quant'].search([
+            ('product_id', 'in', self.products.ids),
+            ('location_id', '=', self.stock_location.id),
+        ])
+        quants.sudo().write({'quantity': 9.0})
+        self.env.flush_all()
+
+        counts, timings = {}, {}
+        for name, moves in (('small', small), ('large', large)):
+            self.env.invalidate_all()
+            queries_before = self.cr.sql_log_count
+            start = time.perf_counter()
+            with self.assertQueryCount(18):
+                moves._check_low_stock_alerts()
+            timings[name] = time.perf_counter() - start
+            counts[name] = self.cr.sql_log_count - queries_before
+
+        opened = self.env['stock.low.stock.alert'].search_count([
+            ('product_id', 'in', self.products.ids),
+            ('state', '=', 'open'),
+        ])
+        self.assertEqual(opened, len(self.products))
+        self._record(
+            'alert_check',
+            moves_small=len(small),
+            moves_large=len(large),
+            queries_small=counts['small'],
+            queries_large=counts['large'],
+            seconds_small=timings['small'],
+            seconds_large=timings['large'],
+        )
+
+    def _validate(self, picking):
+        picking.action_confirm()
+        picking.action_assign()
+        for move in picking.move_ids:
+            move.quantity = move.product_uom_qty
+        picking.button_validate()
+
+    def test_02_action_done(self):
+        """ Consultas, tiempo y mensajes al validar un picking grande que deja todo bajo el mínimo. """
+        # Dos movimientos de 0.75 por producto en cada picking: el primero deja
+        # 10.5 (sin alertas) y el segundo 9 (< 10), que abre todas las alertas
+        baseline = self._create_picking(len(self.products) * 2, 0.75)
+        picking = self._create_picking(len(self.products) * 2, 0.75)
+
+        # Línea base: la misma validación sin evaluar alertas
+        StockMove = type(self.env['stock.move'])
+        with patch.object(StockMove, '_check_low_stock_alerts', lambda moves: None):
+            queries_before = self.cr.sql_log_count
+            self._validate(baseline)
+            self.env.flush_all()
+            baseline_queries = self.cr.sql_log_count - queries_before
+
+        messages_before = self._mail_message_count()
+        queries_before = self.cr.sql_log_count
+        start = time.perf_counter()
+        with self.assertQueryCount(baseline_queries + ALERT_VALIDATION_QUERIES):
+            self._validate(picking)
+        elapsed = time.perf_counter() - start
+        queries = self.cr.sql_log_count - queries_before
+
+        opened = self.env['stock.low.stock.alert'].search_count([
+            ('product_id', 'in', self.products.ids),
+            ('state', '=', 'open'),
+        ])
+        self.assertEqual(opened, len(self.products))
+        # Nada se envía dentro de la transacción de validación
+        self.assertEqual(self._mail_message_count(), messages_before)
+
+        start = time.perf_counter()
+        self.env['stock.alert.notification']._cron_dispatch_notifications()
+        dispatch_elapsed = time.perf_counter() - start
+        messages = self._mail_message_count() - messages_before
+
+        # Un resumen para el picking y un mensaje por producto y plantilla
+        self.assertLessEqual(messages, 2 * len(self.products) + 1)
+
+        self._record(
+            'action_done',
+            moves=len(picking.move_ids),
+            seconds=elapsed,
+            queries=queries,
+            baseline_queries=baseline_queries,
+            dispatch_seconds=dispatch_elapsed,
+            mail_messages=messages,
+        )
+
+    def test_03_is_low_stock_search(self):
+        """ Buscar y contar productos críticos es una consulta SQL indexada. """
+        for product in self.products[:50]:
+            self.env['stock.quant']._update_available_quantity(product, self.stock_location, -5.0)
+        self.env.flush_all()
+
+        ProductTemplate = self.env['product.template']
+        start = time.perf_counter()
+        with self.assertQueryCount(1):
+            count = ProductTemplate.search_count([('is_low_stock', '=', True)])
+        elapsed = time.perf_counter() - start
+        self.assertGreaterEqual(count, 50)
+
+        with self.assertQueryCount(1):
+            ProductTemplate._read_group([('is_low_stock', '=', True)], ['categ_id'], ['__count'])
+
+        self._record('is_low_stock_search', critical=count, seconds=elapsed)
+
+    def _plan_nodes(self, plan):
+        yield plan
+        for child in plan.get('Plans', []):
+            yield from self._plan_nodes(child)
+
+    def test_04_touched_products_scan_uses_indexes(self):
+        """ El escáner incremental lee el historial de movimientos por índice, no por seq scan. """
+        picking = self._create_picking(1, 1.0)
+        self._validate(picking)
+        self.env.flush_all()
+
+        # Historial grande y viejo: copias del movimiento validado
+        self.env.cr.execute("""
+            SELECT column_name FROM information_schema.columns
+             WHERE table_name = 'stock_move' AND column_name NOT IN ('id', 'write_date', 'create_date')
+        """)
+        columns = SQL(', ').join(SQL.identifier(row[0]) for row in self.env.cr.fetchall())
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO stock_move (%s, create_date, write_date)
+            SELECT %s, now() - interval '1 year', now() - interval '1 year'
+              FROM stock_move, generate_series(1, %s)
+             WHERE id = %s
+            """,
+            columns, columns, BENCH_HISTORY, picking.move_ids.id,
+        ))
+        self.env.cr.execute("ANALYZE stock_move")
+
+        since = Datetime.to_string(Datetime.now() - timedelta(minutes=20))
+        self.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", SQL(TOUCHED_PRODUCTS_QUERY, since=since)))
+        plan = self.env.cr.fetchone()[0][0]['Plan']
+        scans = [
+            node['Node Type'] for node in self._plan_nodes(plan)
+            if node.get('Relation Name') == 'stock_move'
+        ]
+        self.assertTrue(scans)
+        self.assertNotIn('Seq Scan', scans)
+
+        start = time.perf_counter()
+        product_ids = self.env['stock.low.stock.alert']._get_touched_product_ids(since)
+        elapsed = time.perf_counter() - start
+        self.assertIn(picking.move_ids.product_id.id, product_ids)
+
+        self._record('touched_products', history=BENCH_HISTORY, seconds=elapsed, stock_move_scans=scans)